@@ -0,0 +1,421 @@
+"""
+benchmarks for the busy paths of the app
+run with: python benchmarks.py <benchmark name> [count]
+"""
+import sys
+import time
+import threading
+import random
+import timeit
+import resource
+import os
+import tempfile
+import io
+import json
+from datetime import datetime, timedelta
+import rest
+from reservation import ReservationDetails
+from courses import DishDetails, Drink, ClientDrink, DrinkSizes, BreadMenu
+import exceptions
+from bill import Bill, BillDetails
+from trusted import trusted
+import snapshot
+import journal
+from sqlite_storage import SqliteStorage
+import commands
+import bulk_import
+import exports
+
+BENCH_TABLES = 200
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / 2 ** 20
+    except OSError:
+        # peak rather than current, the best we get without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+def make_restaurant(tables:int = BENCH_TABLES) -> rest.Restaurant:
+    restaurant = rest.Restaurant("bench")
+    for number in range(1, tables + 1):
+        restaurant.tables.add_table(number, 2 + number % 7)
+    return restaurant
+
+def make_details(first_index:int, count:int) -> list[ReservationDetails]:
+    """
+    two hour bookings starting every 10 minutes, so a dozen tables
+    are busy at any time
+    """
+    first = datetime(2026, 1, 1, 10)
+    return [
+        ReservationDetails(f"guest {i % 5000}", 2, first + timedelta(minutes = 10 * i), timedelta(hours = 2))
+        for i in range(first_index, first_index + count)
+        ]
+
+def load_reservations(restaurant:rest.Restaurant, count:int, chunk:int = 10_000) -> None:
+    for first_index in range(0, count, chunk):
+        details = make_details(first_index, min(chunk, count - first_index))
+        restaurant.reservations.new_reservations_bulk(details)
+
+def bench_memory(count:int = 1_000_000) -> None:
+    restaurant = make_restaurant()
+    before = rss_mb()
+    started = time.perf_counter()
+    load_reservations(restaurant, count)
+    took = time.perf_counter() - started
+    after = rss_mb()
+    print(f"reservations loaded: {len(restaurant.reservations)} in {took:.1f}s")
+    print(f"rss before:          {before:.1f} MB")
+    print(f"rss after:           {after:.1f} MB")
+    print(f"per reservation:     {(after - before) * 2 ** 20 / count:.0f} bytes")
+
+def per_call_us(action, count:int) -> float:
+    return timeit.timeit(action, number = count) / count * 10 ** 6
+
+def bench_trusted(count:int = 100_000) -> None:
+    drink = Drink(DishDetails("lemonade", 12, "fresh"))
+    meal = [ClientDrink(drink, True, DrinkSizes.LARGE) for _ in range(10)]
+    bill = Bill(meal)
+    price = bill.calc_price()
+    tip = bill.calc_tip(price)
+    tax = bill.calc_tax(price + tip)
+    print("per order line (ClientDrink)")
+    print(f"  details validated:  {per_call_us(lambda: DishDetails(drink.name, drink.base_price, drink.description), count):.2f} us")
+    print(f"  details trusted:    {per_call_us(lambda: trusted(DishDetails, name = drink.name, price = drink.base_price, description = drink.description), count):.2f} us")
+    print(f"  whole order:        {per_call_us(lambda: ClientDrink(drink, True, DrinkSizes.LARGE), count):.2f} us")
+    print("per bill (10 lines)")
+    print(f"  details validated:  {per_call_us(lambda: BillDetails(price, tip, tax, price + tip + tax), count):.2f} us")
+    print(f"  details trusted:    {per_call_us(lambda: trusted(BillDetails, price = price, tip = tip, tax = tax, overall = price + tip + tax), count):.2f} us")
+    print(f"  whole bill:         {per_call_us(bill.overall, count):.2f} us")
+
+def bench_bread_stress(stock:int = 100_000, threads:int = 8) -> None:
+    """
+    several terminals selling and reserving the same bread at once,
+    test_bread.py checks that no loaf is sold twice
+    """
+    breads = BreadMenu()
+    pita = breads.add_bread(DishDetails("pita", 3, "fresh"), stock)
+    sold = [0] * threads
+    lowest = [stock]
+    def terminal(index:int) -> None:
+        while True:
+            try:
+                if index % 2:
+                    breads.sell_bread(pita)
+                    sold[index] += 1
+                else:
+                    breads.reserve("pita", 3)
+                    breads.release("pita", 1)
+                    sold[index] += 2
+            except exceptions.NotEnoughBreadError:
+                return
+            lowest[0] = min(lowest[0], pita.quantity)
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    started = time.perf_counter()
+    workers = [threading.Thread(target = terminal, args = (i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    took = time.perf_counter() - started
+    sys.setswitchinterval(switch_interval)
+    print(f"sold {sum(sold)} of {stock} loaves in {took:.2f}s, {pita.quantity} left, lowest stock seen {lowest[0]}")
+
+def bench_concurrent_booking(bookings:int = 50_000, threads:int = 8) -> None:
+    """
+    terminals booking and cancelling in the same restaurant at once,
+    test_concurrent_booking.py checks that no table is double booked
+    """
+    restaurant = make_restaurant(50)
+    first = datetime(2026, 1, 1, 12)
+    booked = [0] * threads
+    def terminal(index:int) -> None:
+        rng = random.Random(index)
+        mine:list[int] = []
+        for _ in range(bookings // threads):
+            if mine and rng.random() < 0.1:
+                restaurant.reservations.cancel_reservation(mine.pop(rng.randrange(len(mine))))
+                continue
+            start = first + timedelta(minutes = 15 * rng.randrange(2000))
+            details = ReservationDetails(f"terminal {index}", rng.randint(1, 8), start, timedelta(minutes = rng.choice([60, 90, 120])))
+            try:
+                mine.append(restaurant.reservations.new_reservation(details).id)
+                booked[index] += 1
+            except exceptions.NoAvailableTablesError:
+                pass
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    started = time.perf_counter()
+    workers = [threading.Thread(target = terminal, args = (i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    took = time.perf_counter() - started
+    sys.setswitchinterval(switch_interval)
+    print(f"{threads} terminals booked {sum(booked)} reservations in {took:.2f}s, {sum(booked) / took:.0f} per second")
+
+def bench_snapshot(count:int = 100_000) -> None:
+    """
+    saves a restaurant with `count` reservations, a few of them with
+    orders, and times loading it back the way main.py does at startup
+    """
+    restaurants = rest.Restaurants()
+    restaurant = make_restaurant()
+    restaurants.collection.append(restaurant)
+    restaurant.menu.add_dish(DishDetails("lemonade", 12, "fresh"), "drink")
+    drink = restaurant.menu.get_dish_by_name("drink", "lemonade")
+    load_reservations(restaurant, count)
+    reservations = restaurant.reservations
+    for reservation in reservations.get_all_reservations()[::10]:
+        reservations.add_order(reservation.id, ClientDrink(drink, True, DrinkSizes.LARGE))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.snapshot")
+        started = time.perf_counter()
+        snapshot.save(restaurants, path)
+        saved = time.perf_counter() - started
+        started = time.perf_counter()
+        loaded = snapshot.load(path)
+        took = time.perf_counter() - started
+        size = os.path.getsize(path)
+    reservations = loaded.collection[0].reservations
+    print(f"saved {count} reservations in {saved:.2f}s, {size / 2 ** 20:.1f} MB")
+    print(f"loaded {len(reservations)} reservations in {took:.2f}s")
+    assert len(reservations) == count
+    assert took < 1, "cold start took a second or more"
+
+def bench_journal(bookings:int = 20_000, threads:int = 4) -> None:
+    """
+    concurrent booking with every booking journaled, then replays the
+    journal into an empty tree and checks it matches the live one
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_path = os.path.join(directory, "bench.snapshot")
+        journal_path = os.path.join(directory, "bench.journal")
+        restaurants, changes = journal.open_restaurants(snapshot_path, journal_path)
+        restaurants.add_restaurant("bench")
+        restaurant = restaurants.get_restaurant_by_name("bench")
+        for number in range(1, 51):
+            restaurant.tables.add_table(number, 2 + number % 7)
+        first = datetime(2026, 1, 1, 12)
+        def terminal(index:int) -> None:
+            rng = random.Random(index)
+            for _ in range(bookings // threads):
+                start = first + timedelta(minutes = 15 * rng.randrange(20_000))
+                try:
+                    restaurant.reservations.new_reservation(ReservationDetails(f"terminal {index}", rng.randint(1, 8), start, timedelta(hours = 1)))
+                except exceptions.NoAvailableTablesError:
+                    pass
+        started = time.perf_counter()
+        workers = [threading.Thread(target = terminal, args = (i,)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        took = time.perf_counter() - started
+        changes.close()
+        booked = len(restaurant.reservations)
+        print(f"{threads} terminals booked and journaled {booked} reservations in {took:.2f}s, {booked / took:.0f} per second")
+        started = time.perf_counter()
+        replayed, changes = journal.open_restaurants(snapshot_path, journal_path)
+        print(f"replayed the journal in {time.perf_counter() - started:.2f}s")
+        changes.close()
+        live = restaurant.reservations.get_all_reservations()
+        restored = replayed.get_restaurant_by_name("bench").reservations.get_all_reservations()
+        assert [(r.id, r.table_num, r.start) for r in live] == [(r.id, r.table_num, r.start) for r in restored]
+        print("replay matches the live restaurant")
+
+def storage_scenario(restaurants:rest.Restaurants, count:int) -> list:
+    """
+    books, cancels, orders and searches in a fresh restaurant,
+    everything it saw is returned to compare engines by
+    """
+    rng = random.Random(5)
+    restaurants.add_restaurant("bench")
+    restaurant = restaurants.get_restaurant_by_name("bench")
+    reservations = restaurant.reservations
+    for number in range(1, 31):
+        restaurant.tables.add_table(number, number % 6 + 1)
+    restaurant.menu.add_dish(DishDetails("lemonade", 12, "fresh"), "drink")
+    drink = restaurant.menu.get_dish_by_name("drink", "lemonade")
+    first = datetime(2026, 1, 1, 12)
+    seen:list = []
+    batch = [
+        ReservationDetails(rng.choice("xyz"), rng.randint(1, 6), first + timedelta(minutes = 15 * rng.randrange(count)), timedelta(minutes = rng.choice([30, 60, 95])))
+        for _ in range(count)
+        ]
+    booked = [r.id for r in reservations.new_reservations_bulk(batch) if not isinstance(r, Exception)]
+    for reservation_id in rng.sample(booked, len(booked) // 10):
+        reservations.cancel_reservation(reservation_id)
+    for reservation in reservations.get_all_reservations()[:100]:
+        reservations.add_order(reservation.id, ClientDrink(drink, True, DrinkSizes.LARGE))
+    for _ in range(200):
+        start = first + timedelta(minutes = rng.randrange(15 * count))
+        try:
+            seen.append(reservations.new_reservation(ReservationDetails("walk in", rng.randint(1, 6), start, timedelta(hours = 1))).table_num)
+        except exceptions.NoAvailableTablesError:
+            seen.append(None)
+        seen.append([r.id for r in reservations.get_reservations_between(start, start + timedelta(hours = 3))])
+        seen.append(reservations.find_next_available(2, timedelta(hours = 1), start, start + timedelta(days = 1))[0])
+    seen.append(reservations.count_reservations_by_table())
+    seen.append([str(r) for r in reservations.get_reservations_by_name("x")])
+    seen.append(restaurant.settle())
+    return seen
+
+def bench_storage(count:int = 5_000) -> None:
+    """
+    runs the same scenario on the in memory and the sqlite engine,
+    fails when they don't see exactly the same thing
+    """
+    started = time.perf_counter()
+    in_memory = storage_scenario(rest.Restaurants(), count)
+    print(f"in memory: {time.perf_counter() - started:.2f}s")
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SqliteStorage(os.path.join(directory, "bench.db"))
+        started = time.perf_counter()
+        in_sqlite = storage_scenario(rest.Restaurants(storage), count)
+        print(f"sqlite:    {time.perf_counter() - started:.2f}s")
+        storage.close()
+    assert in_memory == in_sqlite, "the engines disagree"
+    print("both engines saw the same")
+
+def seed_commands(restaurants:int, tables:int, dishes:int, bookings:int) -> list[str]:
+    """
+    the command lines that set up a chain of restaurants with tables, menus and bookings
+    """
+    lines = []
+    start = datetime(2026, 1, 1, 12)
+    for r in range(restaurants):
+        name = f"restaurant {r}"
+        lines.append({"cmd" : "add_restaurant", "name" : name})
+        lines.extend({"cmd" : "add_table", "restaurant" : name, "number" : t, "sits" : 2 + t % 6} for t in range(1, tables + 1))
+        lines.extend(
+            {"cmd" : "add_dish", "restaurant" : name, "section" : "drink", "name" : f"drink {d}", "price" : 5 + d % 20, "description" : ""}
+            for d in range(dishes)
+            )
+        for b in range(bookings):
+            lines.append({
+                "cmd" : "new_reservation", "restaurant" : name, "name" : f"guest {b}", "sits" : 2,
+                "start" : (start + timedelta(hours = b % 10)).isoformat(), "duration" : 60,
+                })
+            lines.append({"cmd" : "order_dish", "restaurant" : name, "id" : b + 1, "section" : "drink", "name" : f"drink {b % dishes}"})
+    return [json.dumps(line) for line in lines]
+
+def bench_script(restaurants:int = 50) -> None:
+    """
+    seeds a chain through the headless command mode
+    """
+    lines = seed_commands(restaurants, 40, 100, 200)
+    out = io.StringIO()
+    started = time.perf_counter()
+    failed = commands.run_commands(rest.Restaurants(), lines, out)
+    elapsed = time.perf_counter() - started
+    assert failed == 0, out.getvalue()
+    print(f"{len(lines)} commands in {elapsed:.2f}s, {len(lines) / elapsed:,.0f} commands/s")
+
+def bench_import(count:int = 10_000, restaurants:int = 10) -> None:
+    """
+    imports a chain wide menu of `count` dishes spread over the restaurants, from csv and from json
+    """
+    chain = rest.Restaurants()
+    for r in range(restaurants):
+        chain.add_restaurant(f"restaurant {r}")
+    rows = [
+        {
+            "section" : "bread" if i % 10 == 0 else "main_course",
+            "name" : f"dish {i}",
+            "price" : 5 + i % 40,
+            "description" : "imported",
+            "quantity" : 100 if i % 10 == 0 else "",
+            "restaurant" : f"restaurant {i % restaurants}",
+        }
+        for i in range(count)
+        ]
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "menu.csv")
+        with open(csv_path, "w") as menu_file:
+            menu_file.write(",".join(rows[0]) + "\n")
+            menu_file.writelines(",".join(str(value) for value in row.values()) + "\n" for row in rows)
+        started = time.perf_counter()
+        report = bulk_import.import_dishes(chain, csv_path)
+        print(f"csv:  {report.loaded} dishes in {time.perf_counter() - started:.2f}s")
+        assert report.ok and report.loaded == count, report.errors[:5]
+        for row in rows:
+            row["name"] += " again"
+            row["quantity"] = row["quantity"] or None
+        json_path = os.path.join(directory, "menu.json")
+        with open(json_path, "w") as menu_file:
+            json.dump(rows, menu_file, indent = 1)
+        started = time.perf_counter()
+        report = bulk_import.import_dishes(chain, json_path)
+        print(f"json: {report.loaded} dishes in {time.perf_counter() - started:.2f}s")
+        assert report.ok and report.loaded == count, report.errors[:5]
+
+def bench_export(count:int = 500_000) -> None:
+    """
+    exports every reservation and order line to csv, memory has to stay
+    flat while the rows are written
+    """
+    restaurant = make_restaurant()
+    restaurant.menu.add_dish(trusted(DishDetails, name = "cola", price = 12.5, description = ""), "drink")
+    cola = restaurant.menu.get_dish_by_name("drink", "cola")
+    load_reservations(restaurant, count)
+    reservations = restaurant.reservations
+    for reservation in reservations.get_all_reservations()[::2]:
+        reservations.add_order(reservation.id, ClientDrink(cola, True, DrinkSizes.LARGE))
+        reservations.add_order(reservation.id, cola)
+    restaurant.reservations.archive_finished(datetime(2026, 1, 1) + timedelta(minutes = 5 * count))
+    chain = rest.Restaurants()
+    chain.collection.append(restaurant)
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in exports.KINDS:
+            before = rss_mb()
+            started = time.perf_counter()
+            rows = exports.export(chain, kind, "csv", os.path.join(directory, f"{kind}.csv"))
+            took = time.perf_counter() - started
+            grew = rss_mb() - before
+            print(f"{kind}: {rows} rows in {took:.2f}s, rss grew {grew:.1f} MB")
+            assert grew < 20, "the export held on to its rows"
+
+SEARCH_WORDS = (
+    "chicken soup grilled salmon steak salad sweet sour spicy beef pork rice noodle tomato cheese "
+    "garlic lemon mushroom roasted fried baked cream pasta shrimp tuna bean curry green red"
+    ).split()
+
+def bench_search(count:int = 5_000) -> None:
+    """
+    dish searches on a menu of three word names, prefixes that fill the
+    suggestions and misspellings that go through the trigrams
+    """
+    rng = random.Random(1)
+    restaurant = make_restaurant(tables = 1)
+    sections = ("first_course", "main_course", "desert", "drink")
+    for i in range(count):
+        name = f"{' '.join(rng.sample(SEARCH_WORDS, 3))} {i}"
+        restaurant.menu.add_dish(trusted(DishDetails, name = name, price = 10, description = ""), sections[i % len(sections)])
+    for query in ("s", "gril", "salmon", "chiken soup", "spicy beef", "xyz"):
+        print(f"{query!r}: {per_call_us(lambda: restaurant.menu.search_dishes(query), 200):.0f} us")
+
+BENCHMARKS = {
+    "memory" : bench_memory,
+    "trusted" : bench_trusted,
+    "bread" : bench_bread_stress,
+    "booking" : bench_concurrent_booking,
+    "snapshot" : bench_snapshot,
+    "journal" : bench_journal,
+    "storage" : bench_storage,
+    "script" : bench_script,
+    "import" : bench_import,
+    "export" : bench_export,
+    "search" : bench_search,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"usage: python benchmarks.py ({'|'.join(BENCHMARKS)}) [count]")
+        sys.exit(1)
+    args = [int(arg) for arg in sys.argv[2:]]
+    BENCHMARKS[sys.argv[1]](*args)
@@ -1,4 +1,11 @@
+import math
+from array import array
+from fractions import Fraction
+from functools import lru_cache
+from collections.abc import Iterable
 from courses import Dish
+import exceptions
+from trusted import trusted
 from pydantic.dataclasses import dataclass
 
 DEFAULT_TAX_PERCENT = 18
@@ -11,13 +18,42 @@ class BillDetails:
     tax:float
     overall:float
 
+@dataclass
+class SettledBill:
+    price_cents:int
+    tip_cents:int
+    tax_cents:int
+    overall_cents:int
+
 class Bill:
-    def __init__(self, meal:list[Dish], tax:float = DEFAULT_TAX_PERCENT, tip:float = DEFAULT_TIP_PERCENT) -> None:
+    def __init__(
+                self,
+                meal:list[Dish],
+                tax:float = DEFAULT_TAX_PERCENT,
+                tip:float = DEFAULT_TIP_PERCENT,
+                subtotal:float | None = None,
+                verify:bool = False,
+                ) -> None:
+        """
+        Args:
+            subtotal (float | None): the meal's running total when the caller keeps one,
+            saves summing the whole meal
+            verify (bool): recompute the meal anyway and raise BillMismatchError 
+            when it disagrees with the running total
+        """
         self.meal = meal
         self.tip = tip
         self.tax = tax
+        self.subtotal = subtotal
+        self.verify = verify
     def calc_price(self) -> float:
-        return sum(dish.price for dish in self.meal)
+        if self.subtotal is None:
+            return sum(dish.price for dish in self.meal)
+        if self.verify:
+            recomputed = sum(dish.price for dish in self.meal)
+            if not math.isclose(recomputed, self.subtotal, rel_tol = 1e-9, abs_tol = 1e-9):
+                raise exceptions.BillMismatchError
+        return self.subtotal
     def calc_tax(self, price:float) -> float:
         return price * (self.tax / 100)
     def calc_tip(self, price:float) -> float:
@@ -27,4 +63,68 @@ class Bill:
         tip = self.calc_tip(price)
         tax = self.calc_tax(price + tip)
         overall = price + tip + tax
-        return BillDetails(price, tip, tax, overall)
\ No newline at end of file
+        return trusted(BillDetails, price = price, tip = tip, tax = tax, overall = overall)
+
+def _percent_of(cents:array, percent:float) -> list[int]:
+    # exact percent of whole cents, rounded half up
+    ratio = Fraction(str(percent)) / 100
+    num, den = ratio.numerator, ratio.denominator
+    return [(2 * c * num + den) // (2 * den) for c in cents]
+
+@lru_cache(maxsize = 4096)
+def to_cents(price:float) -> int:
+    """
+    a price in whole cents, rounded half up from the price as it's written,
+    so 0.125 is 13 cents where round(0.125 * 100) gives 12
+    """
+    ratio = Fraction(str(price)) * 100
+    return (2 * ratio.numerator + ratio.denominator) // (2 * ratio.denominator)
+
+def settle_columns(
+        meals:Iterable[tuple[int, list[Dish]]],
+        tax:float = DEFAULT_TAX_PERCENT,
+        tip:float = DEFAULT_TIP_PERCENT,
+        ) -> tuple[array, array, list[int], list[int], list[int]]:
+    """
+    settle without building a SettledBill per meal, for callers that go
+    over the bills once in order
+
+    Returns:
+        tuple[array, array, list[int], list[int], list[int]]: the reservation
+        ids and their price, tip, tax and overall cents, one column each
+    """
+    ids = array("q")
+    line_owner = array("q")
+    line_cents = array("q")
+    for row, (reservation_id, meal) in enumerate(meals):
+        ids.append(reservation_id)
+        line_owner.extend([row] * len(meal))
+        line_cents.extend([to_cents(dish.price) for dish in meal])
+    price = array("q", bytes(8 * len(ids)))
+    for row, cents in zip(line_owner, line_cents):
+        price[row] += cents
+    tips = _percent_of(price, tip)
+    taxable = array("q", map(int.__add__, price, tips))
+    taxes = _percent_of(taxable, tax)
+    return ids, price, tips, taxes, list(map(int.__add__, taxable, taxes))
+
+def settle(
+        meals:Iterable[tuple[int, list[Dish]]],
+        tax:float = DEFAULT_TAX_PERCENT,
+        tip:float = DEFAULT_TIP_PERCENT,
+        ) -> dict[int, SettledBill]:
+    """
+    bills many meals at once in integer cents with the same tip and tax
+    rules as Bill, every order line is rounded to whole cents before summing.
+    the lines are flattened into columns and every step is one pass over them
+
+    Args:
+        meals (Iterable[tuple[int, list[Dish]]]): (reservation id, meal) pairs
+
+    Returns:
+        dict[int, SettledBill]: the bill of every reservation id
+    """
+    return {
+        reservation_id : trusted(SettledBill, price_cents = p, tip_cents = t, tax_cents = x, overall_cents = o)
+        for reservation_id, p, t, x, o in zip(*settle_columns(meals, tax, tip))
+        }
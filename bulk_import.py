@@ -0,0 +1,270 @@
+"""
+bulk import of dishes, bread and tables from csv, jsonl or json files.
+
+files are read row by row and validated a batch at a time, a bad row is
+reported with its line and skipped while the rest of the file loads.
+the columns are the ones the menus ask for:
+
+    dishes: section, name, price, description, quantity (bread only), restaurant
+    tables: number, sits, restaurant
+
+restaurant may be left out when the import is for one restaurant. dish
+names and sections are casefolded the same way typed input is
+"""
+import os
+import csv
+import json
+from collections.abc import Callable, Iterator
+from typing import Annotated
+from pydantic import Field, TypeAdapter, ValidationError, field_validator
+from pydantic.dataclasses import dataclass
+import rest
+import exceptions
+from courses import DishDetails
+from food_menu import SECTIONS
+from trusted import trusted
+
+DEFAULT_BATCH_SIZE = 1000
+# errors past this many are counted but not kept
+DEFAULT_MAX_ERRORS = 1000
+_READ_CHUNK = 2 ** 16
+# a json row that doesn't decode out of this many characters is broken, not cut off by a chunk
+_MAX_ROW = 2 ** 20
+
+@dataclass
+class DishRecord:
+    section:str
+    name:str
+    price:Annotated[float, Field(gt = 0)]
+    description:str = ""
+    quantity:Annotated[int, Field(gt = 0)] | None = None
+    restaurant:str | None = None
+
+    @field_validator("section", "name")
+    @classmethod
+    def _normalized(cls, value:str) -> str:
+        return value.strip().casefold()
+
+    @field_validator("section")
+    @classmethod
+    def _known_section(cls, section:str) -> str:
+        if section not in SECTIONS:
+            raise ValueError(f"section has to be one of {', '.join(SECTIONS)}")
+        return section
+
+    @field_validator("name")
+    @classmethod
+    def _valid_name(cls, name:str) -> str:
+        if not name or name.isdigit():
+            raise ValueError("name cannot be empty or digits only")
+        return name
+
+@dataclass
+class TableRecord:
+    number:Annotated[int, Field(gt = 0)]
+    sits:Annotated[int, Field(gt = 0)]
+    restaurant:str | None = None
+
+@dataclass
+class RowError:
+    line:int
+    message:str
+
+@dataclass
+class ImportReport:
+    loaded:int = 0
+    failed:int = 0
+    errors:list[RowError] = Field(default_factory = list)
+
+    @property
+    def ok(self) -> bool:
+        return self.failed == 0
+
+_DISH_BATCH = TypeAdapter(list[DishRecord])
+_TABLE_BATCH = TypeAdapter(list[TableRecord])
+_DISH = TypeAdapter(DishRecord)
+_TABLE = TypeAdapter(TableRecord)
+
+def _csv_rows(source) -> Iterator[tuple[int, dict]]:
+    reader = csv.DictReader(source)
+    for row in reader:
+        # an empty cell is a missing value, not an empty string
+        yield reader.line_num, {key : value for key, value in row.items() if key is not None and value not in ("", None)}
+
+def _jsonl_rows(source) -> Iterator[tuple[int, object]]:
+    for line_num, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except ValueError as error:
+            yield line_num, error
+
+def _json_rows(source) -> Iterator[tuple[int, object]]:
+    """
+    the items of a top level json array, decoded one at a time out of a buffer
+    that is refilled a chunk at a time. a broken row ends the array, the rows
+    after it can't be told apart, so it's yielded as an error and reading stops
+    """
+    decoder = json.JSONDecoder()
+    buffer = source.read(_READ_CHUNK).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("a json import has to be an array of rows")
+    position = 1
+    line_num = 1
+    while True:
+        start = position
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        line_num += buffer.count("\n", start, position)
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError as error:
+            broken, end = error, None
+        # a number at the end of the buffer may go on in the next chunk
+        if end is None or end == len(buffer):
+            chunk = source.read(_READ_CHUNK) if end is not None or len(buffer) - position < _MAX_ROW else ""
+            if chunk:
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            if end is None:
+                if position == len(buffer):
+                    yield line_num, ValueError("the json array isn't closed")
+                else:
+                    yield line_num, ValueError(f"broken json, the rows after it weren't read: {broken.msg}")
+                return
+        yield line_num, item
+        line_num += buffer.count("\n", position, end)
+        position = end
+
+def read_rows(path:str) -> Iterator[tuple[int, object]]:
+    """
+    Yields:
+        tuple[int, object]: the line a row starts on and the row, by the file's extension
+    """
+    extension = os.path.splitext(path)[1].casefold()
+    readers:dict[str, Callable] = {".csv" : _csv_rows, ".jsonl" : _jsonl_rows, ".json" : _json_rows}
+    if extension not in readers:
+        raise ValueError(f"can't import {extension or 'files without an extension'}, use csv, jsonl or json")
+    with open(path, newline = "" if extension == ".csv" else None) as source:
+        yield from readers[extension](source)
+
+def _first_error(error:ValidationError) -> str:
+    detail = error.errors(include_url = False)[0]
+    field = ".".join(str(part) for part in detail["loc"])
+    return f"{field}: {detail['msg']}" if field else detail["msg"]
+
+def _fail(report:ImportReport, line:int, message:str, max_errors:int) -> None:
+    report.failed += 1
+    if len(report.errors) < max_errors:
+        report.errors.append(RowError(line, message))
+
+def _validated(rows:Iterator[tuple[int, object]], batch:TypeAdapter, single:TypeAdapter, batch_size:int, report:ImportReport, max_errors:int) -> Iterator[tuple[int, object]]:
+    """
+    validates the rows a batch at a time, a batch with a bad row is validated
+    again row by row so only the bad ones are reported
+    """
+    pending:list[tuple[int, object]] = []
+    def flush() -> Iterator[tuple[int, object]]:
+        try:
+            records = batch.validate_python([row for _, row in pending])
+            yield from zip((line for line, _ in pending), records)
+        except ValidationError:
+            for line, row in pending:
+                try:
+                    yield line, single.validate_python(row)
+                except ValidationError as error:
+                    _fail(report, line, _first_error(error), max_errors)
+    for line, row in rows:
+        if isinstance(row, Exception):
+            _fail(report, line, str(row), max_errors)
+            continue
+        pending.append((line, row))
+        if len(pending) >= batch_size:
+            yield from flush()
+            pending = []
+    if pending:
+        yield from flush()
+
+def _restaurant_for(restaurants:rest.Restaurants, default:rest.Restaurant | None, name:str | None) -> rest.Restaurant:
+    if name is None:
+        if default is None:
+            raise exceptions.RestaurantNotExistError("the row doesn't say which restaurant it's for")
+        return default
+    if default is not None and name == default.name:
+        return default
+    return restaurants.get_restaurant_by_name(name)
+
+def _load(
+            restaurants:rest.Restaurants,
+            path:str,
+            restaurant_name:str | None,
+            batch:TypeAdapter,
+            single:TypeAdapter,
+            add:Callable[[rest.Restaurant, object], None],
+            batch_size:int,
+            max_errors:int,
+            ) -> ImportReport:
+    report = ImportReport()
+    default = restaurants.get_restaurant_by_name(restaurant_name) if restaurant_name is not None else None
+    # most files are for a handful of restaurants, the lookups are kept
+    found:dict[str | None, rest.Restaurant] = {}
+    for line, record in _validated(read_rows(path), batch, single, batch_size, report, max_errors):
+        try:
+            restaurant = found.get(record.restaurant)
+            if restaurant is None:
+                restaurant = found[record.restaurant] = _restaurant_for(restaurants, default, record.restaurant)
+            add(restaurant, record)
+            report.loaded += 1
+        except (exceptions.CustomExceptions, ValueError) as error:
+            _fail(report, line, str(error) or type(error).__name__, max_errors)
+    return report
+
+def _add_dish(restaurant:rest.Restaurant, record:DishRecord) -> None:
+    if record.section == "bread" and record.quantity is None:
+        raise ValueError("bread requires quantity")
+    # the row was just validated, no need to validate its details again
+    details = trusted(DishDetails, name = record.name, price = record.price, description = record.description)
+    restaurant.menu.add_dish(details, record.section, record.quantity if record.section == "bread" else None)
+
+def _add_table(restaurant:rest.Restaurant, record:TableRecord) -> None:
+    restaurant.tables.add_table(record.number, record.sits)
+
+def import_dishes(
+            restaurants:rest.Restaurants,
+            path:str,
+            restaurant_name:str | None = None,
+            batch_size:int = DEFAULT_BATCH_SIZE,
+            max_errors:int = DEFAULT_MAX_ERRORS,
+            ) -> ImportReport:
+    """
+    adds every dish in the file, bread that is already on the menu is restocked
+
+    Args:
+        restaurant_name (str | None): the restaurant of the rows that don't name one
+
+    Returns:
+        ImportReport: how many rows were loaded and what was wrong with the others
+
+    Raises:
+        ValueError: the file isn't a csv, jsonl or json file, or the json isn't an array
+    """
+    return _load(restaurants, path, restaurant_name, _DISH_BATCH, _DISH, _add_dish, batch_size, max_errors)
+
+def import_tables(
+            restaurants:rest.Restaurants,
+            path:str,
+            restaurant_name:str | None = None,
+            batch_size:int = DEFAULT_BATCH_SIZE,
+            max_errors:int = DEFAULT_MAX_ERRORS,
+            ) -> ImportReport:
+    """
+    adds every table in the file, see import_dishes
+    """
+    return _load(restaurants, path, restaurant_name, _TABLE_BATCH, _TABLE, _add_table, batch_size, max_errors)
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,293 @@
+"""
+headless command mode, one json command per line in and one json result
+per line out, straight against the domain objects without any menus.
+
+    {"cmd": "add_restaurant", "name": "luigi"}
+    {"cmd": "add_table", "restaurant": "luigi", "number": 1, "sits": 4}
+    {"cmd": "new_reservation", "restaurant": "luigi", "name": "dana", "sits": 2, "start": "2026-01-01T19:00", "duration": 90}
+
+    {"cmd": "order_dish", "restaurant": "luigi", "id": 1, "section": "drink", "name": "cola", "is_cold": true, "ref": "a1"}
+
+"id" is always a reservation id. every result is {"ok": true, "result": ...}
+or {"ok": false, "error": ..., "message": ...} and carries the command's
+"ref" back when it has one, any json value the caller likes to match
+results to commands. times are iso 8601 and durations are whole minutes
+"""
+import sys
+import json
+from collections.abc import Callable, Iterable
+from datetime import datetime, timedelta
+from typing import TextIO
+from pydantic import ValidationError
+import rest
+import exceptions
+import bulk_import
+import exports
+from bill import Bill
+from courses import DishDetails, ClientDesert, ClientDrink, DrinkSizes, BreadInventory, Dish, OrderLine
+from reservation import Reservation, ReservationDetails
+from tables import Table
+
+Command = Callable[[rest.Restaurants, dict], object]
+
+def _restaurant(restaurants:rest.Restaurants, args:dict) -> rest.Restaurant:
+    return restaurants.get_restaurant_by_name(args["restaurant"])
+
+def _minutes(args:dict, key:str) -> timedelta:
+    return timedelta(minutes = int(args[key]))
+
+def _flag(args:dict, key:str) -> bool:
+    value = args.get(key, False)
+    if not isinstance(value, bool):
+        raise TypeError(f"{key} has to be true or false")
+    return value
+
+def _reservation_json(reservation:Reservation) -> dict:
+    return {
+        "id" : reservation.id,
+        "name" : reservation.name,
+        "table" : reservation.table_num,
+        "start" : reservation.start.isoformat(),
+        "end" : reservation.end.isoformat(),
+        "meal" : [dish.name for dish in reservation._meal or ()],
+        "comments" : list(reservation._comments or ()),
+        "subtotal" : reservation.subtotal,
+    }
+
+def _dish_json(dish:Dish | BreadInventory) -> dict:
+    if isinstance(dish, BreadInventory):
+        return {"id" : dish.bread.id, "name" : dish.bread.name, "price" : dish.bread.price, "description" : dish.bread.description, "quantity" : dish.quantity}
+    return {"id" : dish.id, "name" : dish.name, "price" : dish.price, "description" : dish.description}
+
+def _table_json(table:Table) -> dict:
+    return {"number" : table.number, "sits" : table.sits}
+
+def add_restaurant(restaurants:rest.Restaurants, args:dict) -> None:
+    restaurants.add_restaurant(args["name"])
+
+def delete_restaurant(restaurants:rest.Restaurants, args:dict) -> None:
+    restaurants.delete_restaurant_by_name(args["name"])
+
+def list_restaurants(restaurants:rest.Restaurants, args:dict) -> list[str]:
+    return [restaurant.name for restaurant in restaurants.collection]
+
+def add_table(restaurants:rest.Restaurants, args:dict) -> None:
+    _restaurant(restaurants, args).tables.add_table(int(args["number"]), int(args["sits"]))
+
+def remove_table(restaurants:rest.Restaurants, args:dict) -> None:
+    _restaurant(restaurants, args).tables.remove_table_by_number(int(args["number"]))
+
+def list_tables(restaurants:rest.Restaurants, args:dict) -> list[dict]:
+    return [_table_json(table) for table in _restaurant(restaurants, args).tables.collection.values()]
+
+def add_dish(restaurants:rest.Restaurants, args:dict) -> None:
+    details = DishDetails(args["name"], args["price"], args.get("description", ""))
+    _restaurant(restaurants, args).menu.add_dish(details, args["section"], args.get("quantity"))
+
+def remove_dish(restaurants:rest.Restaurants, args:dict) -> None:
+    _restaurant(restaurants, args).menu.remove_dish(args["name"], args["section"])
+
+def list_dishes(restaurants:rest.Restaurants, args:dict) -> list[dict]:
+    menu = _restaurant(restaurants, args).menu
+    component = menu._get_menu_component(args["section"])
+    dishes = component.menu if args["section"] == "bread" else component.items
+    return [_dish_json(dish) for dish in dishes.values()]
+
+def search_dishes(restaurants:rest.Restaurants, args:dict) -> list[str]:
+    return _restaurant(restaurants, args).menu.search_dishes(args["query"], args.get("section"))
+
+def new_reservation(restaurants:rest.Restaurants, args:dict) -> dict:
+    restaurant = _restaurant(restaurants, args)
+    duration = _minutes(args, "duration")
+    # the same check the menus make when the duration is typed in
+    if duration < restaurant.min_meal_time or duration <= timedelta(0):
+        raise ValueError(f"duration cannot be less than {restaurant.min_meal_time}")
+    details = ReservationDetails(args["name"], args["sits"], args["start"], duration)
+    # the journal and the indexes keep local times in whole minutes
+    if details.start.tzinfo is not None:
+        raise ValueError("start has to be a local time without a utc offset")
+    if details.start.second or details.start.microsecond:
+        raise ValueError("start has to be on a whole minute")
+    return _reservation_json(restaurant.reservations.new_reservation(details))
+
+def cancel_reservation(restaurants:rest.Restaurants, args:dict) -> None:
+    _restaurant(restaurants, args).reservations.cancel_reservation(int(args["id"]))
+
+def get_reservation(restaurants:rest.Restaurants, args:dict) -> dict:
+    return _reservation_json(_restaurant(restaurants, args).reservations.get_reservation_by_id(int(args["id"])))
+
+def list_reservations(restaurants:rest.Restaurants, args:dict) -> list[dict]:
+    reservations = _restaurant(restaurants, args).reservations
+    if "after" in args or "before" in args:
+        found = reservations.get_reservations_between(
+            datetime.fromisoformat(args.get("after", datetime.min.isoformat())),
+            datetime.fromisoformat(args.get("before", datetime.max.isoformat())),
+            )
+    else:
+        found = reservations.get_all_reservations()
+    return [_reservation_json(reservation) for reservation in found]
+
+def find_next_available(restaurants:rest.Restaurants, args:dict) -> dict:
+    start, table = _restaurant(restaurants, args).reservations.find_next_available(
+        int(args["sits"]),
+        _minutes(args, "duration"),
+        datetime.fromisoformat(args["after"]),
+        datetime.fromisoformat(args["until"]),
+        )
+    return {"start" : start.isoformat(), "table" : table.number}
+
+def order_dish(restaurants:rest.Restaurants, args:dict) -> dict:
+    """
+    deserts take "with_sugar" and drinks "is_cold" and "size" (s/m/l), bread is taken out of stock
+    """
+    restaurant = _restaurant(restaurants, args)
+    reservations = restaurant.reservations
+    reservation_id = int(args["id"])
+    section = args["section"]
+    dish:Dish | OrderLine
+    if section == "bread":
+        # a loaf is only sold to a reservation that is there to order it
+        reservations._get_active_reservation(reservation_id)
+        bread = restaurant.menu.bread
+        dish = bread.order_bread(bread.get_bread_by_name(args["name"]))
+        try:
+            reservations.add_order(reservation_id, dish)
+        except exceptions.ReservationNotFoundError:
+            # cancelled or archived between the check and the order
+            bread.release(dish.name, 1)
+            raise
+        return {"name" : dish.name, "price" : dish.price}
+    dish = restaurant.menu.get_dish_by_name(section, args["name"])
+    if section == "desert":
+        dish = ClientDesert(dish, _flag(args, "with_sugar"))
+    elif section == "drink":
+        dish = ClientDrink(dish, _flag(args, "is_cold"), DrinkSizes(args.get("size", DrinkSizes.SMALL.value)))
+    reservations.add_order(reservation_id, dish)
+    return {"name" : dish.name, "price" : dish.price}
+
+def add_comment(restaurants:rest.Restaurants, args:dict) -> None:
+    _restaurant(restaurants, args).reservations.add_comment(int(args["id"]), args["comment"])
+
+def get_bill(restaurants:rest.Restaurants, args:dict) -> dict:
+    reservation = _restaurant(restaurants, args).reservations.get_reservation_by_id(int(args["id"]))
+    bill = Bill(reservation.get_meal_list(), subtotal = reservation.subtotal).overall()
+    return {"price" : bill.price, "tip" : bill.tip, "tax" : bill.tax, "overall" : bill.overall}
+
+def _report_json(report:bulk_import.ImportReport) -> dict:
+    return {
+        "loaded" : report.loaded,
+        "failed" : report.failed,
+        "errors" : [{"line" : error.line, "message" : error.message} for error in report.errors],
+    }
+
+def import_dishes(restaurants:rest.Restaurants, args:dict) -> dict:
+    return _report_json(bulk_import.import_dishes(restaurants, args["path"], args.get("restaurant")))
+
+def import_tables(restaurants:rest.Restaurants, args:dict) -> dict:
+    return _report_json(bulk_import.import_tables(restaurants, args["path"], args.get("restaurant")))
+
+def export(restaurants:rest.Restaurants, args:dict) -> dict:
+    """
+    writes every restaurant's "reservations" or "order_lines" starting in [after, before) to "path"
+    """
+    rows = exports.export(
+        restaurants,
+        args["kind"],
+        args.get("format", "csv"),
+        args["path"],
+        datetime.fromisoformat(args["after"]) if "after" in args else None,
+        datetime.fromisoformat(args["before"]) if "before" in args else None,
+        )
+    return {"rows" : rows}
+
+COMMANDS:dict[str, Command] = {
+    "add_restaurant" : add_restaurant,
+    "delete_restaurant" : delete_restaurant,
+    "list_restaurants" : list_restaurants,
+    "add_table" : add_table,
+    "remove_table" : remove_table,
+    "list_tables" : list_tables,
+    "add_dish" : add_dish,
+    "remove_dish" : remove_dish,
+    "list_dishes" : list_dishes,
+    "search_dishes" : search_dishes,
+    "new_reservation" : new_reservation,
+    "cancel_reservation" : cancel_reservation,
+    "get_reservation" : get_reservation,
+    "list_reservations" : list_reservations,
+    "find_next_available" : find_next_available,
+    "order_dish" : order_dish,
+    "add_comment" : add_comment,
+    "get_bill" : get_bill,
+    "import_dishes" : import_dishes,
+    "import_tables" : import_tables,
+    "export" : export,
+}
+
+def run_command(restaurants:rest.Restaurants, line:str) -> dict:
+    """
+    runs one command line, a bad command is reported in its result and never raised
+    """
+    ref = None
+    try:
+        args = json.loads(line)
+        if not isinstance(args, dict):
+            raise ValueError("a command has to be a json object")
+        ref = args.get("ref")
+        name = args.get("cmd")
+        if name not in COMMANDS:
+            return _failure(ref, "UnknownCommand", f"unknown command {name!r}")
+        result = COMMANDS[name](restaurants, args)
+    except KeyError as error:
+        return _failure(ref, "MissingArgument", f"missing argument {error.args[0]!r}")
+    except ValidationError as error:
+        return _failure(ref, "InvalidArgument", str(error.errors(include_url = False)[0]["msg"]))
+    # a duration or time past what datetime holds overflows, it's as bad an argument as any other
+    except (exceptions.CustomExceptions, ValueError, TypeError, ArithmeticError, OSError) as error:
+        return _failure(ref, type(error).__name__, str(error))
+    response:dict = {"ok" : True, "result" : result}
+    if ref is not None:
+        response["ref"] = ref
+    return response
+
+def _failure(ref, error:str, message:str) -> dict:
+    response:dict = {"ok" : False, "error" : error, "message" : message}
+    if ref is not None:
+        response["ref"] = ref
+    return response
+
+def run_commands(restaurants:rest.Restaurants, lines:Iterable[str], out:TextIO, flush_each:bool = False) -> int:
+    """
+    runs every command line and writes its result line to `out`, blank lines are skipped
+
+    Args:
+        flush_each (bool): flush after every result, for a caller waiting on each answer
+
+    Returns:
+        int: number of commands that failed
+    """
+    failed = 0
+    write = out.write
+    for line in lines:
+        if not line.strip():
+            continue
+        response = run_command(restaurants, line)
+        failed += not response["ok"]
+        write(json.dumps(response))
+        write("\n")
+        if flush_each:
+            out.flush()
+    out.flush()
+    return failed
+
+def run_script(restaurants:rest.Restaurants, path:str) -> int:
+    """
+    runs the commands in the file at `path`, or from stdin when path is "-"
+    """
+    if path == "-":
+        return run_commands(restaurants, sys.stdin, sys.stdout, flush_each = not sys.stdin.isatty())
+    with open(path) as script:
+        return run_commands(restaurants, script, sys.stdout)
+
+if __name__ == "__main__":
+    pass
@@ -1,6 +1,12 @@
+import threading
+from typing import TYPE_CHECKING
 import exceptions
+from trusted import trusted
 from pydantic.dataclasses import dataclass
 from enum import Enum
+from storage import MenuStore, MemoryMenuStore
+if TYPE_CHECKING:
+    from journal import RestaurantJournal
 
 ADDITION_FOR_COLD_DRINK = 10
 ADDITION_FOR_MEDIUM_DRINK = 15
@@ -13,6 +19,8 @@ class DishDetails:
     description:str
 
 class Dish:
+    __slots__ = ("name", "base_price", "description", "id")
+    section:str | None = None
     def __init__(self, dish_details:DishDetails, dish_id:int | None = None) -> None:
         self.name = dish_details.name
         self.base_price = dish_details.price
@@ -25,122 +33,202 @@ class Dish:
     def __str__(self) -> str:
         return f"{self.name}, costs: {self.base_price}, description {self.description}\n"
     
+class OrderLine:
+    """
+    a dish as ordered, a reference to the menu dish plus a modifier
+    code into the prices the dish worked out once for every modifier
+    """
+    __slots__ = ("dish", "code")
+    def __init__(self, dish, code:int) -> None:
+        self.dish = dish
+        self.code = code
+    @classmethod
+    def from_code(cls, dish, code:int):
+        line = object.__new__(cls)
+        OrderLine.__init__(line, dish, code)
+        return line
+    @property
+    def name(self) -> str:
+        return self.dish.name
+    @property
+    def description(self) -> str:
+        return self.dish.description
+    @property
+    def base_price(self) -> float:
+        return self.dish.base_price
+    @property
+    def section(self) -> str | None:
+        return self.dish.section
+    @property
+    def price(self) -> float:
+        return self.dish.modifier_prices[self.code]
+
+    def __str__(self) -> str:
+        return str(self.dish)
+
 class MenuSection:
     def __init__(self,allowed_type) -> None:
         self.allowed_type = allowed_type
-        self.items:list[Dish] = []
+        self.items:dict[str, Dish] = {}
+        # bumped on every change, the rendered menu is reused while it stays the same
+        self.version = 0
+        self._rendered:tuple[int, str] | None = None
     def __str__(self) -> str:
-        return "".join([str(item) for item in self.items])
+        if self._rendered is None or self._rendered[0] != self.version:
+            self._rendered = (self.version, "".join([str(item) for item in self.items.values()]))
+        return self._rendered[1]
     def add(self, item):
         if not isinstance(item, self.allowed_type):
             raise TypeError
-        self.items.append(item)
+        if item.name in self.items:
+            raise exceptions.DishAlreadyExistError
+        self.items[item.name] = item
+        self.version += 1
     def get_dish_by_name(self, name):
         try:
-            return next(dish for dish in self.items if dish.name == name)
-        except StopIteration:
+            return self.items[name]
+        except KeyError:
             raise exceptions.DishNotExistError
     def remove(self, name):
-        dish = self.get_dish_by_name(name)
-        self.items.remove(dish)
+        self.get_dish_by_name(name)
+        del self.items[name]
+        self.version += 1
        
 class FirstCourse(Dish):
-    pass
+    __slots__ = ()
+    section = "first_course"
 class FirstCourses(MenuSection):
     def __init__(self, allowed_type) -> None:
         super().__init__(allowed_type)
         self.allowed_type = FirstCourse
 
 class MainCourse(Dish):
-    pass
+    __slots__ = ()
+    section = "main_course"
 class MainCourses(MenuSection):
     def __init__(self, allowed_type) -> None:
         super().__init__(allowed_type)
         self.allowed_type = MainCourse
 
 class Additional(Dish):
-    pass
+    __slots__ = ()
+    section = "additional"
 class Additionals(MenuSection):
     def __init__(self, allowed_type) -> None:
         super().__init__(allowed_type)
         self.allowed_type = Additional
     
+WITH_SUGAR_ADDITIONS = {True : 0, False : 10}
+# order line modifier codes of a desert
+WITH_SUGAR_CODES = {True : 0, False : 1}
+
 class Desert(Dish):
+    __slots__ = ("modifier_prices",)
+    section = "desert"
     def __init__(self, dish_details: DishDetails, dish_id: int | None = None) -> None:
         super().__init__(dish_details, dish_id)
         self.base_price = dish_details.price
+        self.modifier_prices = tuple(
+            self.base_price * (1 + WITH_SUGAR_ADDITIONS[with_sugar] / 100)
+            for with_sugar in WITH_SUGAR_CODES
+            )
 class Deserts(MenuSection):
     def __init__(self, allowed_type) -> None:
         super().__init__(allowed_type)
         self.allowed_type = Desert
 
-class ClientDesert(Desert):
+class ClientDesert(OrderLine):
+    __slots__ = ()
     def __init__(self, base:Desert, with_sugar:bool) -> None:
-        super().__init__(DishDetails(base.name, base.base_price, base.description))
-        self.with_sugar = with_sugar
+        super().__init__(base, WITH_SUGAR_CODES[with_sugar])
     @property
-    def price(self) ->float:
-        with_sugar_options = {True : 0, False : 10}
-        addition = with_sugar_options[self.with_sugar]
-        return self.base_price * (1 + addition / 100)
+    def with_sugar(self) -> bool:
+        return self.code == WITH_SUGAR_CODES[True]
+
+class DrinkSizes(Enum):
+    SMALL = "s"
+    MEDIUM = "m"
+    LARGE = "l"
+
+IS_COLD_ADDITIONS = {True : ADDITION_FOR_COLD_DRINK, False : 0}
+SIZE_ADDITIONS = {
+    DrinkSizes.SMALL : 0, 
+    DrinkSizes.MEDIUM : ADDITION_FOR_MEDIUM_DRINK, 
+    DrinkSizes.LARGE : ADDITION_FOR_LARGE_DRINK
+    }
+# order line modifier codes of a drink, one per (size, is cold)
+DRINK_MODIFIERS = [(size, is_cold) for size in DrinkSizes for is_cold in (False, True)]
+DRINK_CODES = {modifier : code for code, modifier in enumerate(DRINK_MODIFIERS)}
 
 class Drink(Dish):
+    __slots__ = ("modifier_prices",)
+    section = "drink"
     def __init__(self, dish_details: DishDetails, dish_id: int | None = None) -> None:
         super().__init__(dish_details, dish_id)
         self.base_price = dish_details.price
+        self.modifier_prices = tuple(
+            self.base_price * (1 + (IS_COLD_ADDITIONS[is_cold] + SIZE_ADDITIONS[size]) / 100)
+            for size, is_cold in DRINK_MODIFIERS
+            )
 class Drinks(MenuSection):
     def __init__(self, allowed_type) -> None:
         super().__init__(allowed_type)
         self.allowed_type = Drink
 
-class DrinkSizes(Enum):
-    SMALL = "s"
-    MEDIUM = "m"
-    LARGE = "l"
-
-class ClientDrink(Drink):
+class ClientDrink(OrderLine):
+    __slots__ = ()
     def __init__(self, base:Drink, is_cold:bool, size:DrinkSizes) -> None:
-        super().__init__(DishDetails(base.name, base.base_price, base.description))
-        self.is_cold = is_cold
-        self.size = size
+        super().__init__(base, DRINK_CODES[(size, is_cold)])
     @property
-    def price(self):
-        is_cold_options = {True : ADDITION_FOR_COLD_DRINK, False : 0}
-        size_options = {
-            DrinkSizes.SMALL : 0, 
-            DrinkSizes.MEDIUM : ADDITION_FOR_MEDIUM_DRINK, 
-            DrinkSizes.LARGE : ADDITION_FOR_LARGE_DRINK
-            }
-        sum_up_addition = is_cold_options[self.is_cold] + size_options[self.size]
-        return self.base_price * (1 + sum_up_addition / 100)
+    def size(self) -> DrinkSizes:
+        return DRINK_MODIFIERS[self.code][0]
+    @property
+    def is_cold(self) -> bool:
+        return DRINK_MODIFIERS[self.code][1]
 
 class Bread(Dish):
-    pass
+    __slots__ = ()
+    section = "bread"
 
 class BreadInventory:
-    def __init__(self, dish_details:DishDetails, quantity:int) -> None:
-        self.bread = Bread(DishDetails(dish_details.name, dish_details.price, dish_details.description))
+    __slots__ = ("bread", "quantity")
+    def __init__(self, dish_details:DishDetails, quantity:int, dish_id:int | None = None) -> None:
+        self.bread = Bread(trusted(DishDetails, name = dish_details.name, price = dish_details.price, description = dish_details.description), dish_id)
         self.quantity = quantity
 
 class BreadMenu:
-    def __init__(self) -> None:
-        self.menu:list[BreadInventory] = []
+    def __init__(self, store:MenuStore | None = None) -> None:
+        self.menu:dict[str, BreadInventory] = {}
+        # bumped on every change, the rendered menu is reused while it stays the same
+        self.version = 0
+        self._rendered:tuple[int, str] | None = None
+        # guards the stock, several terminals sell from the same bread menu
+        self._lock = threading.Lock()
+        self.journal:RestaurantJournal | None = None
+        # stock changes are written through, adding and removing bread is up to the Menu
+        self.store = store or MemoryMenuStore()
 
-    def add_bread(self, dish_details:DishDetails, quantity:int):
-        for bread_inventory in self.menu:
-            if bread_inventory.bread.name == dish_details.name:
+    def add_bread(self, dish_details:DishDetails, quantity:int, dish_id:int | None = None) -> BreadInventory:
+        with self._lock:
+            self.version += 1
+            bread_inventory = self.menu.get(dish_details.name)
+            if bread_inventory is not None:
                 bread_inventory.quantity += quantity
-                return
-        self.menu.append(BreadInventory(dish_details, quantity))
+                self.store.save_stock(dish_details.name, bread_inventory.quantity)
+                return bread_inventory
+            bread_inventory = self.menu[dish_details.name] = BreadInventory(dish_details, quantity, dish_id)
+            return bread_inventory
 
     def remove_bread(self, name):
-        bread = self.get_bread_by_name(name)
-        self.menu.remove(bread)
+        with self._lock:
+            self.get_bread_by_name(name)
+            del self.menu[name]
+            self.version += 1
 
     def get_bread_by_name(self, name) -> BreadInventory:
         try:
-            return next(bread for bread in self.menu if bread.bread.name == name)
-        except StopIteration:
+            return self.menu[name]
+        except KeyError:
             raise exceptions.DishNotExistError
         
     def order_bread(self, bread:BreadInventory) -> Bread:
@@ -148,17 +236,68 @@ class BreadMenu:
         return bread.bread
         
     def sell_bread(self, bread:BreadInventory):
-        for bread_inventory in self.menu:
-            if bread_inventory == bread:
-                if bread_inventory.quantity == 0:
-                    raise exceptions.NotEnoughBreadError
-                bread_inventory.quantity -= 1
-                return None
-        raise exceptions.DishNotExistError
+        with self._lock:
+            if self.menu.get(bread.bread.name) is not bread:
+                raise exceptions.DishNotExistError
+            self._take(bread, 1)
+            self.store.save_stock(bread.bread.name, bread.quantity)
+            if self.journal:
+                self.journal.record("sell_bread", name = bread.bread.name)
+
+    def reserve(self, name:str, quantity:int) -> BreadInventory:
+        """
+        takes `quantity` loaves out of stock at once, all or nothing
+        """
+        with self._lock:
+            bread = self.get_bread_by_name(name)
+            self._take(bread, quantity)
+            self.store.save_stock(name, bread.quantity)
+            if self.journal:
+                self.journal.record("reserve_bread", name = name, quantity = quantity)
+            return bread
+
+    def release(self, name:str, quantity:int) -> None:
+        """
+        puts back loaves taken by reserve that were not served
+        """
+        if quantity <= 0:
+            raise ValueError("quantity has to be positive")
+        with self._lock:
+            bread = self.get_bread_by_name(name)
+            bread.quantity += quantity
+            self.version += 1
+            self.store.save_stock(name, bread.quantity)
+            if self.journal:
+                self.journal.record("release_bread", name = name, quantity = quantity)
+
+    def _take(self, bread:BreadInventory, quantity:int) -> None:
+        if quantity <= 0:
+            raise ValueError("quantity has to be positive")
+        if bread.quantity < quantity:
+            raise exceptions.NotEnoughBreadError
+        bread.quantity -= quantity
+        self.version += 1
     
     def __str__(self) -> str:
+        version = self.version
+        if self._rendered is not None and self._rendered[0] == version:
+            return self._rendered[1]
         breads = []
-        for i in self.menu:
+        for i in self.menu.values():
             if i.quantity > 0:
                 breads.append(f"{i.bread.name} costs {i.bread.price} {i.quantity} in stock\n")
-        return "".join(breads)
\ No newline at end of file
+        self._rendered = (version, "".join(breads))
+        return self._rendered[1]
+
+# the order line type of every section whose orders carry modifiers
+ORDER_LINE_TYPES:dict[str, type[OrderLine]] = {
+    "desert" : ClientDesert,
+    "drink" : ClientDrink,
+}
+# saved order code of a dish ordered as it is, without an order line
+PLAIN_ORDER = -1
+
+DISH_TYPES:dict[str, type[Dish]] = {
+    dish_type.section : dish_type
+    for dish_type in (Bread, FirstCourse, MainCourse, Additional, Desert, Drink)
+}
@@ -0,0 +1,170 @@
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Iterator
+from itertools import islice
+from operator import itemgetter
+import heapq
+
+DEFAULT_SUGGESTIONS = 5
+MIN_SIMILARITY = 0.3
+# a misspelling counts the postings of its rarest trigrams first and stops once this
+# many were walked, the common trigrams are shared by a good part of a big menu
+MAX_POSTINGS = 2000
+# names sharing the most trigrams that are scored, per suggestion asked for
+CANDIDATES_PER_SUGGESTION = 20
+
+def normalize(text:str) -> str:
+    return " ".join(text.casefold().split())
+
+def trigrams(text:str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class DishSearchIndex:
+    """
+    prefix and typo tolerant search over dish names.
+    prefixes come from sorted lists of the names and of their words, one of
+    each per section, typos from an inverted index of the names' trigrams
+    """
+    def __init__(self) -> None:
+        # per section, the names and the (word, name) pairs sorted for prefix
+        # bisects. adds only append, a list is sorted again when it's next searched
+        self._name_prefixes:dict[str, list[str]] = {}
+        self._word_prefixes:dict[str, list[tuple[str, str]]] = {}
+        self._unsorted:set[str] = set()
+        # the trigram postings hold small ints, they count faster than (name, section) pairs
+        self._trigrams:dict[str, set[int]] = {}
+        # "Soup" and "soup" are one entry, it stays indexed until the last of them is removed
+        self._names:dict[tuple[str, str], list[str]] = {}
+        self._ids:dict[tuple[str, str], int] = {}
+        self._entries:dict[int, tuple[str, str]] = {}
+        self._gram_counts:dict[int, int] = {}
+        self._next_id = 0
+
+    def add(self, name:str, section:str) -> None:
+        key = normalize(name)
+        entry = (key, section)
+        if entry in self._names:
+            if name not in self._names[entry]:
+                self._names[entry].append(name)
+            return
+        self._names[entry] = [name]
+        self._name_prefixes.setdefault(section, []).append(key)
+        words = self._word_prefixes.setdefault(section, [])
+        for word in key.split()[1:]:
+            words.append((word, key))
+        self._unsorted.add(section)
+        entry_id = self._ids[entry] = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        grams = trigrams(key)
+        self._gram_counts[entry_id] = len(grams)
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(entry_id)
+
+    def _sort(self, section:str) -> None:
+        if section in self._unsorted:
+            self._name_prefixes[section].sort()
+            self._word_prefixes[section].sort()
+            self._unsorted.discard(section)
+
+    def remove(self, name:str, section:str) -> None:
+        key = normalize(name)
+        entry = (key, section)
+        names = self._names.get(entry)
+        if names is None or name not in names:
+            return
+        names.remove(name)
+        if names:
+            return
+        del self._names[entry]
+        entry_id = self._ids.pop(entry)
+        del self._entries[entry_id]
+        del self._gram_counts[entry_id]
+        self._sort(section)
+        names = self._name_prefixes[section]
+        names.pop(bisect_left(names, key))
+        words = self._word_prefixes[section]
+        for word in key.split()[1:]:
+            words.pop(bisect_left(words, (word, key)))
+        for gram in trigrams(key):
+            postings = self._trigrams[gram]
+            postings.discard(entry_id)
+            if not postings:
+                del self._trigrams[gram]
+
+    def _names_starting(self, query:str, section:str) -> Iterator[tuple[str, str]]:
+        names = self._name_prefixes[section]
+        for i in range(bisect_left(names, query), len(names)):
+            if not names[i].startswith(query):
+                return
+            yield names[i], section
+
+    def _words_starting(self, query:str, section:str) -> Iterator[tuple[str, str, str]]:
+        words = self._word_prefixes[section]
+        for i in range(bisect_left(words, (query,)), len(words)):
+            word, key = words[i]
+            if not word.startswith(query):
+                return
+            yield word, key, section
+
+    def search(self, query:str, section:str | None = None, limit:int = DEFAULT_SUGGESTIONS) -> list[tuple[str, str]]:
+        """
+        exact matches come first, then names starting with the query, then
+        names with a later word starting with it, by that word, and last the
+        closest misspellings. the prefix walks stop once `limit` names are
+        found and misspellings are only looked for when they didn't fill it
+
+        Returns:
+            list[tuple[str, str]]: up to `limit` (section, dish name) pairs
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        sections = [section] if section is not None else list(self._name_prefixes)
+        sections = [name for name in sections if name in self._name_prefixes]
+        for name in sections:
+            self._sort(name)
+        found = list(islice(heapq.merge(*(self._names_starting(query, name) for name in sections)), limit))
+        if len(found) < limit:
+            seen = set(found)
+            for _, key, entry_section in heapq.merge(*(self._words_starting(query, name) for name in sections)):
+                entry = (key, entry_section)
+                if entry not in seen:
+                    seen.add(entry)
+                    found.append(entry)
+                    if len(found) == limit:
+                        break
+            if len(found) < limit:
+                found.extend(self._closest(query, section, limit - len(found), seen))
+        spellings = ((entry_section, name) for key, entry_section in found for name in self._names[(key, entry_section)])
+        return list(islice(spellings, limit))
+
+    def _closest(self, query:str, section:str | None, limit:int, seen:set[tuple[str, str]]) -> list[tuple[str, str]]:
+        query_grams = trigrams(query)
+        query_count = len(query_grams)
+        # rare trigrams tell the names apart, they're counted first and the walk stops
+        # after MAX_POSTINGS, the common ones are only checked for the best candidates
+        postings = sorted((self._trigrams.get(gram, ()) for gram in query_grams), key = len)
+        shared:Counter[int] = Counter()
+        walked = 0
+        for counted, grams in enumerate(postings, 1):
+            shared.update(grams)
+            walked += len(grams)
+            if walked >= MAX_POSTINGS:
+                break
+        skipped = postings[counted:]
+        candidates = limit * CANDIDATES_PER_SUGGESTION
+        scored:list[tuple[float, tuple[str, str]]] = []
+        for entry_id, count in sorted(shared.items(), key = itemgetter(1), reverse = True):
+            entry = self._entries[entry_id]
+            if entry in seen or (section is not None and entry[1] != section):
+                continue
+            count += sum(entry_id in grams for grams in skipped)
+            similarity = 2 * count / (query_count + self._gram_counts[entry_id])
+            if similarity >= MIN_SIMILARITY:
+                scored.append((-similarity, entry))
+            candidates -= 1
+            if not candidates:
+                break
+        return [entry for _, entry in heapq.nsmallest(limit, scored)]
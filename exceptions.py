@@ -13,6 +13,9 @@ class SectionNotExistError(CustomExceptions):
 class DishNotExistError(CustomExceptions):
     pass
 
+class DishAlreadyExistError(CustomExceptions):
+    pass
+
 class TableNumberAlreadyExistError(CustomExceptions):
     pass
 
@@ -28,5 +31,17 @@ class NoAvailableTablesError(CustomExceptions):
 class RestaurantAlreadyExistsError(CustomExceptions):
     pass
 
+class BillMismatchError(CustomExceptions):
+    pass
+
+class SnapshotError(CustomExceptions):
+    pass
+
+class JournalError(CustomExceptions):
+    pass
+
+class ExportError(CustomExceptions):
+    pass
+
 class BackMenu(Exception):
     pass
@@ -0,0 +1,239 @@
+"""
+streaming exports of reservations and their order lines for accounting.
+
+rows are made by generators that walk the reservations a day at a time,
+so an export holds the same few rows in memory however many reservations
+there are. money is in whole cents, billed with the same rules as bill.settle.
+csv and jsonl are always there, parquet needs pyarrow installed
+"""
+import csv
+import json
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from itertools import islice
+from typing import TextIO
+import rest
+import bill
+import exceptions
+from courses import Dish, OrderLine, ClientDesert, ClientDrink
+from timeutil import MINUTE
+
+RESERVATION_FIELDS = (
+    "restaurant",
+    "reservation_id",
+    "name",
+    "table",
+    "start",
+    "end",
+    "duration_minutes",
+    "order_lines",
+    "price_cents",
+    "tip_cents",
+    "tax_cents",
+    "overall_cents",
+)
+ORDER_LINE_FIELDS = (
+    "restaurant",
+    "reservation_id",
+    "start",
+    "line",
+    "section",
+    "dish_id",
+    "dish",
+    "modifiers",
+    "base_price_cents",
+    "price_cents",
+)
+KINDS = {"reservations" : RESERVATION_FIELDS, "order_lines" : ORDER_LINE_FIELDS}
+# reservations billed together, bill.settle works a column at a time
+SETTLE_CHUNK = 1000
+# rows per parquet row group
+PARQUET_CHUNK = 10_000
+
+def _modifiers(dish:Dish | OrderLine) -> str:
+    if isinstance(dish, ClientDrink):
+        return f"size {dish.size.value}, cold" if dish.is_cold else f"size {dish.size.value}"
+    if isinstance(dish, ClientDesert):
+        # both states are priced, the one without sugar costs more
+        return "with sugar" if dish.with_sugar else "no sugar"
+    return ""
+
+def reservation_rows(
+            restaurant:rest.Restaurant,
+            after:datetime | None = None,
+            before:datetime | None = None,
+            tax:float = bill.DEFAULT_TAX_PERCENT,
+            tip:float = bill.DEFAULT_TIP_PERCENT,
+            ) -> Iterator[tuple]:
+    """
+    one row per reservation starting in [after, before), archived ones included
+
+    Yields:
+        tuple: the RESERVATION_FIELDS of a reservation
+    """
+    records = restaurant.reservations.iter_records(after, before)
+    while True:
+        chunk = list(islice(records, SETTLE_CHUNK))
+        if not chunk:
+            return
+        _, price, tips, taxes, overall = bill.settle_columns(((record[0], record[5]) for record in chunk), tax, tip)
+        for (reservation_id, name, table_num, start, duration, meal, _), p, t, x, o in zip(chunk, price, tips, taxes, overall):
+            yield (restaurant.name, reservation_id, name, table_num, start, start + duration, duration // MINUTE, len(meal), p, t, x, o)
+
+def order_line_rows(
+            restaurant:rest.Restaurant,
+            after:datetime | None = None,
+            before:datetime | None = None,
+            ) -> Iterator[tuple]:
+    """
+    one row per ordered dish of every reservation starting in [after, before),
+    the lines of a reservation are numbered from 1 in the order they were ordered
+
+    Yields:
+        tuple: the ORDER_LINE_FIELDS of an order line
+    """
+    for reservation_id, _, _, start, _, meal, _ in restaurant.reservations.iter_records(after, before):
+        for line, dish in enumerate(meal, 1):
+            base = dish.dish if isinstance(dish, OrderLine) else dish
+            yield (
+                restaurant.name,
+                reservation_id,
+                start,
+                line,
+                dish.section,
+                base.id,
+                dish.name,
+                _modifiers(dish),
+                bill.to_cents(dish.base_price),
+                bill.to_cents(dish.price),
+                )
+
+ROW_MAKERS = {"reservations" : reservation_rows, "order_lines" : order_line_rows}
+
+def _check_kind(kind:str) -> None:
+    if kind not in ROW_MAKERS:
+        raise ValueError(f"can't export {kind!r}, use {' or '.join(ROW_MAKERS)}")
+
+def chain_rows(restaurants:rest.Restaurants, kind:str, after:datetime | None = None, before:datetime | None = None) -> Iterator[tuple]:
+    """
+    the rows of `kind` of every restaurant, one restaurant after the other
+    """
+    _check_kind(kind)
+    return _chain_rows(list(restaurants.collection), ROW_MAKERS[kind], after, before)
+
+def _chain_rows(restaurants:list[rest.Restaurant], make_rows, after:datetime | None, before:datetime | None) -> Iterator[tuple]:
+    for restaurant in restaurants:
+        yield from make_rows(restaurant, after, before)
+
+# the fields holding datetimes, written out as iso 8601 text
+TIME_FIELDS = frozenset(("start", "end"))
+
+def _as_text(rows:Iterable[tuple], fields:tuple[str, ...]) -> Iterator[list]:
+    times = [i for i, field in enumerate(fields) if field in TIME_FIELDS]
+    for row in rows:
+        row = list(row)
+        for i in times:
+            row[i] = row[i].isoformat()
+        yield row
+
+def write_csv(rows:Iterable[tuple], fields:tuple[str, ...], out:TextIO) -> int:
+    """
+    Returns:
+        int: number of rows written, the header not included
+    """
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    count = 0
+    for row in _as_text(rows, fields):
+        writer.writerow(row)
+        count += 1
+    return count
+
+def write_jsonl(rows:Iterable[tuple], fields:tuple[str, ...], out:TextIO) -> int:
+    """
+    Returns:
+        int: number of rows written
+    """
+    count = 0
+    write = out.write
+    encode = json.JSONEncoder().encode
+    for row in _as_text(rows, fields):
+        write(encode(dict(zip(fields, row))))
+        write("\n")
+        count += 1
+    return count
+
+def _parquet_schema(fields:tuple[str, ...]):
+    import pyarrow
+    types = {
+        "restaurant" : pyarrow.string(),
+        "name" : pyarrow.string(),
+        "section" : pyarrow.string(),
+        "dish" : pyarrow.string(),
+        "modifiers" : pyarrow.string(),
+        "start" : pyarrow.timestamp("s"),
+        "end" : pyarrow.timestamp("s"),
+    }
+    return pyarrow.schema([(field, types.get(field, pyarrow.int64())) for field in fields])
+
+def write_parquet(rows:Iterable[tuple], fields:tuple[str, ...], path:str) -> int:
+    """
+    writes the rows a row group at a time
+
+    Returns:
+        int: number of rows written
+
+    Raises:
+        exceptions.ExportError: pyarrow isn't installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise exceptions.ExportError("parquet exports need pyarrow, pip install pyarrow")
+    schema = _parquet_schema(fields)
+    count = 0
+    rows = iter(rows)
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        while True:
+            chunk = list(islice(rows, PARQUET_CHUNK))
+            if not chunk:
+                break
+            columns = {field : list(column) for field, column in zip(fields, zip(*chunk))}
+            writer.write_table(pyarrow.Table.from_pydict(columns, schema = schema))
+            count += len(chunk)
+    return count
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+def export(
+            restaurants:rest.Restaurants,
+            kind:str,
+            file_format:str,
+            path:str,
+            after:datetime | None = None,
+            before:datetime | None = None,
+            ) -> int:
+    """
+    exports the reservations or order lines of every restaurant starting in [after, before) to `path`
+
+    Args:
+        kind (str): reservations or order_lines
+        file_format (str): csv, jsonl or parquet
+
+    Returns:
+        int: number of rows written
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"can't export to {file_format!r}, use {', '.join(FORMATS)}")
+    rows = chain_rows(restaurants, kind, after, before)
+    fields = KINDS[kind]
+    if file_format == "parquet":
+        return write_parquet(rows, fields, path)
+    with open(path, "w", newline = "" if file_format == "csv" else None) as out:
+        if file_format == "csv":
+            return write_csv(rows, fields, out)
+        return write_jsonl(rows, fields, out)
+
+if __name__ == "__main__":
+    pass
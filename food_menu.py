@@ -1,6 +1,12 @@
+from typing import TYPE_CHECKING
 import courses
 import exceptions
-from courses import DishDetails, BreadMenu
+from courses import DishDetails, BreadMenu, Dish, OrderLine, BreadInventory
+from dish_search import DishSearchIndex, DEFAULT_SUGGESTIONS
+from storage import MenuStore, MemoryMenuStore
+from trusted import trusted
+if TYPE_CHECKING:
+    from journal import RestaurantJournal
 
 ComponentName = (
     courses.FirstCourses |
@@ -11,30 +17,100 @@ ComponentName = (
     courses.BreadMenu
 )
 
+SECTIONS = (
+    "bread",
+    "first_course",
+    "main_course",
+    "additional",
+    "desert",
+    "drink",
+)
+_VALID_SECTIONS = frozenset(SECTIONS)
+
+MenuEntry = Dish | BreadInventory
+
 class Menu:
-    def __init__(self) -> None:
-        self.bread = courses.BreadMenu()
+    def __init__(self, store:MenuStore | None = None) -> None:
+        self.store = store or MemoryMenuStore()
+        self.bread = courses.BreadMenu(self.store)
         self.first_course = courses.FirstCourses(courses.FirstCourse)
         self.main_course = courses.MainCourses(courses.MainCourse)
         self.additional = courses.Additionals(courses.Additional)
         self.desert = courses.Deserts(courses.Desert)
         self.drink = courses.Drinks(courses.Drink)
+        self._dish_id_count = 1
+        # menu wide indexes, by name every section holding a dish of that name
+        self._by_id:dict[int, tuple[str, MenuEntry]] = {}
+        self._by_name:dict[str, dict[str, MenuEntry]] = {}
+        self.search_index = DishSearchIndex()
+        self.journal:RestaurantJournal | None = None
+        for section, dish_id, name, price, description, quantity in self.store.load():
+            self._add_dish(trusted(DishDetails, name = name, price = price, description = description), section, quantity, dish_id)
+
+    def add_dish(self, dish_details:DishDetails, component_name:str, quantity: int | None = None, dish_id:int | None = None) -> None:
+        """
+        dish_id is only for putting back a saved menu, new dishes get the next free id
+        """
+        _, dish_id, is_new = self._add_dish(dish_details, component_name, quantity, dish_id)
+        if is_new:
+            self.store.save_dish(component_name, dish_id, dish_details, quantity)
+        if self.journal:
+            self.journal.record(
+                "add_dish",
+                section = component_name,
+                name = dish_details.name,
+                price = dish_details.price,
+                description = dish_details.description,
+                quantity = quantity,
+                dish_id = dish_id,
+                )
 
-    def add_dish(self, dish_details:DishDetails, component_name:str, quantity: int | None = None) -> None:
+    def _add_dish(self, dish_details:DishDetails, component_name:str, quantity:int | None, dish_id:int | None) -> tuple[MenuEntry, int, bool]:
         component:ComponentName = self._get_menu_component(component_name)
+        if dish_id is None:
+            dish_id = self._dish_id_count
         if isinstance(component, courses.BreadMenu):
             if quantity is None:
                 raise ValueError("bread requires quantity")
-            component.add_bread(dish_details, quantity)
+            is_new = dish_details.name not in component.menu
+            entry:MenuEntry = component.add_bread(dish_details, quantity, dish_id)
         else:
-            component.add(component.allowed_type(dish_details))
+            is_new = True
+            entry = component.allowed_type(dish_details, dish_id)
+            component.add(entry)
+        if is_new:
+            self._dish_id_count = max(self._dish_id_count, dish_id + 1)
+            self._index(component_name, entry, dish_id)
+        return entry, dish_id, is_new
 
     def remove_dish(self, dish_name:str, component_name:str):
+        entry = self.get_dish_by_name(component_name, dish_name)
         component:ComponentName = self._get_menu_component(component_name)
         if isinstance(component, courses.BreadMenu):
             component.remove_bread(dish_name)
         else:
             component.remove(dish_name)
+        self._unindex(component_name, entry)
+        self.store.delete_dish(component_name, dish_name)
+        if self.journal:
+            self.journal.record("remove_dish", section = component_name, name = dish_name)
+
+    def _index(self, component_name:str, entry:MenuEntry, dish_id:int) -> None:
+        self._by_id[dish_id] = (component_name, entry)
+        self._by_name.setdefault(self._entry_name(entry), {})[component_name] = entry
+        self.search_index.add(self._entry_name(entry), component_name)
+
+    def _unindex(self, component_name:str, entry:MenuEntry) -> None:
+        dish = entry.bread if isinstance(entry, BreadInventory) else entry
+        self._by_id.pop(dish.id, None)
+        sections = self._by_name[dish.name]
+        del sections[component_name]
+        if not sections:
+            del self._by_name[dish.name]
+        self.search_index.remove(dish.name, component_name)
+
+    def _entry_name(self, entry:MenuEntry) -> str:
+        return entry.bread.name if isinstance(entry, BreadInventory) else entry.name
 
     def view_dishes(self, component_name:str):
         component = self._get_menu_component(component_name)
@@ -43,19 +119,55 @@ class Menu:
         return output if output else empty_list_output
 
     def _get_menu_component(self, component_name):
-        valid = {"bread",
-        "first_course",
-        "main_course",
-        "additional",
-        "desert",
-        "drink"}
-        if component_name not in valid:
+        if component_name not in _VALID_SECTIONS:
             raise exceptions.SectionNotExistError
         return getattr(self, component_name)
-    
+
     def get_dish_by_name(self, component_name, dish_name):
         component:ComponentName = self._get_menu_component(component_name)
         if isinstance(component, BreadMenu):
             return self.bread.get_bread_by_name(dish_name)
         else:
-            return component.get_dish_by_name(dish_name)
\ No newline at end of file
+            return component.get_dish_by_name(dish_name)
+
+    def find_dish_by_name(self, dish_name:str) -> tuple[str, MenuEntry]:
+        """
+        looks a dish up in every section at once
+
+        Returns:
+            tuple[str, MenuEntry]: the section and the dish, the first section
+            the name was added to when more than one section has it
+        """
+        sections = self._by_name.get(dish_name)
+        if not sections:
+            raise exceptions.DishNotExistError
+        return next(iter(sections.items()))
+
+    def get_dish_by_id(self, dish_id:int) -> tuple[str, MenuEntry]:
+        try:
+            return self._by_id[dish_id]
+        except KeyError:
+            raise exceptions.DishNotExistError
+
+    def resolve_order(self, section:str, dish_id:int | None, name:str, price:float, description:str, code:int) -> Dish | OrderLine:
+        """
+        the ordered dish back from what was saved about it, the menu's own
+        dish when it's still there and a standalone copy when it isn't
+        """
+        dish = None
+        if dish_id is not None and dish_id in self._by_id:
+            entry = self._by_id[dish_id][1]
+            dish = entry.bread if isinstance(entry, BreadInventory) else entry
+        if dish is None or dish.name != name or dish.section != section:
+            dish = courses.DISH_TYPES[section](trusted(DishDetails, name = name, price = price, description = description), dish_id)
+        if code == courses.PLAIN_ORDER:
+            return dish
+        return courses.ORDER_LINE_TYPES[section].from_code(dish, code)
+
+    def search_dishes(self, query:str, component_name:str | None = None, limit:int = DEFAULT_SUGGESTIONS) -> list[str]:
+        """
+        dish names matching `query` by prefix or by a close spelling, best first
+        """
+        if component_name is not None:
+            self._get_menu_component(component_name)
+        return [name for _, name in self.search_index.search(query, component_name, limit)]
@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+
+DEFAULT_BLOCK_SIZE = 1000
+
+class IdAllocator(ABC):
+    """
+    hands out reservation ids, next_id has to be safe to call from several threads
+    """
+    @abstractmethod
+    def next_id(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def advance(self, past:int) -> None:
+        """
+        makes sure every id handed out from now on is bigger than `past`
+        """
+        raise NotImplementedError
+
+class CounterIdAllocator(IdAllocator):
+    """
+    in memory counter, starts over with the process
+    """
+    def __init__(self, first:int = 1) -> None:
+        self._next = first
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            _id = self._next
+            self._next += 1
+            return _id
+
+    def advance(self, past:int) -> None:
+        with self._lock:
+            self._next = max(self._next, past + 1)
+
+class SqliteBlockIdAllocator(IdAllocator):
+    """
+    takes blocks of `block_size` ids from a sequence row in an sqlite file,
+    so workers sharing the file never get the same id and a restart
+    carries on after the last block. ids from one worker go up, ids across
+    workers interleave by block and the unused rest of a block is skipped
+    """
+    def __init__(self, path:str, sequence:str, block_size:int = DEFAULT_BLOCK_SIZE) -> None:
+        if block_size <= 0:
+            raise ValueError("block size has to be positive")
+        self.sequence = sequence
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self._connection = sqlite3.connect(path, timeout = 30, isolation_level = None, check_same_thread = False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS id_sequences (name TEXT PRIMARY KEY, next INTEGER NOT NULL)")
+
+    def _take_block(self, at_least:int = 1) -> None:
+        connection = self._connection
+        # BEGIN IMMEDIATE takes the write lock first, so two workers can't read the same block
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT next FROM id_sequences WHERE name = ?", (self.sequence,)).fetchone()
+            start = max(row[0] if row else 1, at_least)
+            connection.execute(
+                "INSERT INTO id_sequences (name, next) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET next = excluded.next",
+                (self.sequence, start + self.block_size),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._next, self._end = start, start + self.block_size
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._take_block()
+            _id = self._next
+            self._next += 1
+            return _id
+
+    def advance(self, past:int) -> None:
+        with self._lock:
+            if past < self._next:
+                return
+            if past + 1 < self._end:
+                self._next = past + 1
+            else:
+                self._take_block(past + 1)
+
+    def close(self) -> None:
+        self._connection.close()
+
+# hands each restaurant its allocator by the restaurant's name
+AllocatorFactory = Callable[[str], IdAllocator]
+
+def sqlite_block_allocators(path:str, block_size:int = DEFAULT_BLOCK_SIZE) -> AllocatorFactory:
+    """
+    a factory of SqliteBlockIdAllocators sharing the file at `path`, one
+    sequence per restaurant name
+    """
+    return lambda restaurant_name: SqliteBlockIdAllocator(path, restaurant_name, block_size)
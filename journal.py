@@ -0,0 +1,310 @@
+"""
+append only journal of every change made to a Restaurants tree.
+
+every change is one json line with a sequence number, lines are written
+as the change happens and fsynced in batches. on startup the snapshot is
+loaded and the lines it doesn't hold yet are replayed on top of it.
+compaction moves the journal aside and folds it into a fresh snapshot
+in the background, from the files alone so the live tree isn't touched
+"""
+from __future__ import annotations
+import os
+import json
+import threading
+import rest
+import snapshot
+import exceptions
+import courses
+from courses import DishDetails, Dish, OrderLine
+from reservation import Reservation
+from timeutil import from_minutes, MINUTE
+from trusted import trusted
+from id_allocator import AllocatorFactory
+
+DEFAULT_SYNC_EVERY = 64
+DEFAULT_SYNC_INTERVAL = 0.05
+DEFAULT_COMPACT_AFTER = 64 * 2 ** 20
+
+def _compacting_path(path:str) -> str:
+    return f"{path}.compacting"
+
+class Journal:
+    """
+    Args:
+        path (str): the journal file
+        snapshot_path (str): the snapshot compaction folds the journal into
+        next_seq (int): sequence number of the next line
+        sync_every (int): lines written before they are fsynced as a batch
+        sync_interval (float): seconds a written line waits at most for its fsync
+        compact_after (int): journal size in bytes that starts a compaction
+    """
+    def __init__(
+                self,
+                path:str,
+                snapshot_path:str,
+                next_seq:int = 1,
+                sync_every:int = DEFAULT_SYNC_EVERY,
+                sync_interval:float = DEFAULT_SYNC_INTERVAL,
+                compact_after:int = DEFAULT_COMPACT_AFTER,
+                ) -> None:
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_after = compact_after
+        self._seq = next_seq
+        self._unsynced = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        self._compaction:threading.Thread | None = None
+        # set while a checkpoint runs, no compaction starts until it's done
+        self._checkpointing = False
+        self._closed = threading.Event()
+        self._syncer = threading.Thread(target = self._sync_loop, daemon = True)
+        self._syncer.start()
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq - 1
+
+    def record(self, op:str, **fields) -> None:
+        with self._lock:
+            fields["op"] = op
+            fields["seq"] = self._seq
+            self._seq += 1
+            self._file.write(json.dumps(fields).encode() + b"\n")
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self._sync()
+
+    def bind(self, restaurant_name:str) -> RestaurantJournal:
+        return RestaurantJournal(self, restaurant_name)
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._unsynced:
+                self._sync()
+
+    def _sync_loop(self) -> None:
+        # lines written between batches wait here for at most sync_interval
+        while not self._closed.wait(self.sync_interval):
+            with self._lock:
+                if self._unsynced:
+                    self._sync()
+                too_big = self._file.tell() >= self.compact_after
+            if too_big:
+                self.compact()
+
+    def compact(self) -> threading.Thread | None:
+        """
+        moves the journal aside and folds it into the snapshot on a background thread
+
+        Returns:
+            threading.Thread | None: the compaction, None when one is still running
+            or a checkpoint is
+        """
+        with self._lock:
+            if self._checkpointing or (self._compaction is not None and self._compaction.is_alive()):
+                return None
+            if os.path.exists(_compacting_path(self.path)):
+                # left over from a compaction that didn't finish, folded first
+                self._compaction = threading.Thread(target = fold, args = (self.snapshot_path, self.path), daemon = True)
+                self._compaction.start()
+                return self._compaction
+            if self._unsynced:
+                self._sync()
+            self._file.close()
+            os.replace(self.path, _compacting_path(self.path))
+            self._file = open(self.path, "ab")
+            self._compaction = threading.Thread(target = fold, args = (self.snapshot_path, self.path), daemon = True)
+            self._compaction.start()
+            return self._compaction
+
+    def checkpoint(self, restaurants:rest.Restaurants) -> None:
+        """
+        saves the live tree as the snapshot and empties the journal,
+        nothing may change the tree while it runs, e.g. on exit
+        """
+        with self._lock:
+            self._checkpointing = True
+            compaction = self._compaction
+        try:
+            # the one started before the flag was set is the last to run
+            if compaction is not None:
+                compaction.join()
+            with self._lock:
+                if self._unsynced:
+                    self._sync()
+                snapshot.save(restaurants, self.snapshot_path, self.last_seq)
+                self._file.truncate(0)
+                compacting = _compacting_path(self.path)
+                if os.path.exists(compacting):
+                    os.remove(compacting)
+        finally:
+            with self._lock:
+                self._checkpointing = False
+
+    def close(self) -> None:
+        self._closed.set()
+        self._syncer.join()
+        if self._compaction is not None:
+            self._compaction.join()
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+class RestaurantJournal:
+    """
+    the journal as one restaurant's tables, menu and reservations see it
+    """
+    def __init__(self, journal:Journal, restaurant_name:str) -> None:
+        self.journal = journal
+        self.restaurant_name = restaurant_name
+
+    def record(self, op:str, **fields) -> None:
+        self.journal.record(op, restaurant = self.restaurant_name, **fields)
+
+    def record_order(self, reservation_id:int, dish:Dish | OrderLine) -> None:
+        """
+        the ordered dish is kept by its menu id plus what is needed
+        to rebuild it if it's gone from the menu by replay time
+        """
+        code = courses.PLAIN_ORDER
+        if isinstance(dish, OrderLine):
+            dish, code = dish.dish, dish.code
+        self.record(
+            "add_order",
+            id = reservation_id,
+            dish = [dish.section, dish.id, dish.name, dish.base_price, dish.description],
+            code = code,
+            )
+
+def _apply(restaurants:rest.Restaurants, record:dict) -> None:
+    op = record["op"]
+    if op == "add_restaurant":
+        restaurants.add_restaurant(record["name"])
+        return
+    if op == "delete_restaurant":
+        restaurants.delete_restaurant_by_name(record["name"])
+        return
+    restaurant = restaurants.get_restaurant_by_name(record["restaurant"])
+    menu = restaurant.menu
+    reservations = restaurant.reservations
+    if op == "add_table":
+        restaurant.tables.add_table(record["number"], record["sits"])
+    elif op == "remove_table":
+        restaurant.tables.remove_table_by_number(record["number"])
+    elif op == "add_dish":
+        details = trusted(DishDetails, name = record["name"], price = record["price"], description = record["description"])
+        menu.add_dish(details, record["section"], record["quantity"], record["dish_id"])
+    elif op == "remove_dish":
+        menu.remove_dish(record["name"], record["section"])
+    elif op == "sell_bread":
+        menu.bread.sell_bread(menu.bread.get_bread_by_name(record["name"]))
+    elif op == "reserve_bread":
+        menu.bread.reserve(record["name"], record["quantity"])
+    elif op == "release_bread":
+        menu.bread.release(record["name"], record["quantity"])
+    elif op == "cancel_reservation":
+        reservations.cancel_reservation(record["id"])
+    elif op == "add_order":
+        reservations.add_order(record["id"], menu.resolve_order(*record["dish"], record["code"]))
+    elif op == "add_comment":
+        reservations.add_comment(record["id"], record["comment"])
+    elif op == "archive_finished":
+        reservations.archive_finished(from_minutes(record["now"]))
+    else:
+        raise exceptions.JournalError(f"unknown journal operation {op!r}")
+
+def replay(restaurants:rest.Restaurants, path:str, after_seq:int = 0) -> tuple[int, int]:
+    """
+    applies the journal lines newer than `after_seq` to `restaurants`,
+    a torn last line from a crash mid write is ignored
+
+    Returns:
+        tuple[int, int]: the last sequence number in the journal and the
+        length in bytes of its complete lines
+    """
+    last_seq = after_seq
+    good_length = 0
+    # runs of bookings are restored in one go, that's what most of a journal is
+    booked:list[Reservation] = []
+    booked_in:rest.Restaurant | None = None
+    with open(path, "rb") as lines:
+        for line in lines:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise exceptions.JournalError(f"corrupt journal line at byte {good_length}")
+            good_length += len(line)
+            if record["seq"] <= after_seq:
+                continue
+            last_seq = record["seq"]
+            if record["op"] == "new_reservation":
+                restaurant = restaurants.get_restaurant_by_name(record["restaurant"])
+                if booked and restaurant is not booked_in:
+                    booked_in.reservations.restore(booked)
+                    booked = []
+                booked_in = restaurant
+                booked.append(Reservation(record["id"], record["name"], record["table"], from_minutes(record["start"]), record["duration"] * MINUTE))
+                continue
+            if booked:
+                booked_in.reservations.restore(booked)
+                booked = []
+            _apply(restaurants, record)
+    if booked:
+        booked_in.reservations.restore(booked)
+    return last_seq, good_length
+
+def fold(snapshot_path:str, journal_path:str) -> None:
+    """
+    folds the journal that compaction moved aside into a fresh snapshot
+    """
+    compacting = _compacting_path(journal_path)
+    restaurants, last_seq = _load_snapshot(snapshot_path)
+    last_seq, _ = replay(restaurants, compacting, last_seq)
+    snapshot.save(restaurants, snapshot_path, last_seq)
+    os.remove(compacting)
+
+def _load_snapshot(snapshot_path:str, id_allocators:AllocatorFactory | None = None) -> tuple[rest.Restaurants, int]:
+    if not os.path.exists(snapshot_path):
+        return rest.Restaurants(id_allocators = id_allocators), 0
+    return snapshot.load(snapshot_path, id_allocators), snapshot.journal_position(snapshot_path)
+
+def open_restaurants(
+            snapshot_path:str,
+            journal_path:str,
+            id_allocators:AllocatorFactory | None = None,
+            **options,
+            ) -> tuple[rest.Restaurants, Journal]:
+    """
+    loads the snapshot, replays the journal on top of it and
+    starts journaling every change of the restaurants from there.
+    every restaurant, loaded, replayed or added later, takes its ids from
+    `id_allocators` when it's given
+
+    Returns:
+        tuple[rest.Restaurants, Journal]: the restaurants and their journal
+    """
+    restaurants, last_seq = _load_snapshot(snapshot_path, id_allocators)
+    compacting = _compacting_path(journal_path)
+    if os.path.exists(compacting):
+        last_seq, _ = replay(restaurants, compacting, last_seq)
+    if os.path.exists(journal_path):
+        last_seq, good_length = replay(restaurants, journal_path, last_seq)
+        # a torn line would end up in front of the next record
+        with open(journal_path, "r+b") as journal_file:
+            journal_file.truncate(good_length)
+    journal = Journal(journal_path, snapshot_path, last_seq + 1, **options)
+    restaurants.attach_journal(journal)
+    return restaurants, journal
+
+if __name__ == "__main__":
+    pass
@@ -2,13 +2,43 @@
 restaurant manager 1.1
 by yis
 """
+import sys
+import argparse
 import menus
-import rest
+import journal
+import commands
+from id_allocator import sqlite_block_allocators
 
-def main()->None:
-    restaurants = rest.Restaurants()
-    menu = menus.MainMenu("welcome to the restaurant management app", restaurants)
-    menu.run()
+SNAPSHOT_PATH = "restaurants.snapshot"
+JOURNAL_PATH = "restaurants.journal"
+
+def parse_args(argv:list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description = "restaurant management app")
+    parser.add_argument(
+        "--script",
+        metavar = "PATH",
+        help = "run the json commands in PATH, one per line, instead of the menus. - reads them from stdin",
+        )
+    parser.add_argument(
+        "--ids",
+        metavar = "PATH",
+        help = "take reservation ids in blocks from the sqlite file at PATH, so workers sharing it never hand out the same id",
+        )
+    return parser.parse_args(argv)
+
+def main(argv:list[str] | None = None)->int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    id_allocators = sqlite_block_allocators(args.ids) if args.ids is not None else None
+    restaurants, changes = journal.open_restaurants(SNAPSHOT_PATH, JOURNAL_PATH, id_allocators)
+    try:
+        if args.script is not None:
+            return 1 if commands.run_script(restaurants, args.script) else 0
+        menu = menus.MainMenu("welcome to the restaurant management app", restaurants)
+        menu.run()
+        return 0
+    finally:
+        changes.checkpoint(restaurants)
+        changes.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
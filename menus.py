@@ -164,17 +164,22 @@ class AddDishes(Menu):
         return DishDetails(name, price, description)
     
     def redirect_add_dish(self, component_name:str):
-        dish_details:DishDetails = self.get_dish_details()
-        if component_name == "bread":
-            quantity = self.io.get_int_input(
-                "enter quantity",
-                "quantity cannot be less than 1",
-                "quantity must be a number",
-                1
-            )
-            self.food_menu.add_dish(dish_details, component_name, quantity)
-        else:    
-            self.food_menu.add_dish(dish_details, component_name)
+        while True:
+            dish_details:DishDetails = self.get_dish_details()
+            if component_name == "bread":
+                quantity = self.io.get_int_input(
+                    "enter quantity",
+                    "quantity cannot be less than 1",
+                    "quantity must be a number",
+                    1
+                )
+                self.food_menu.add_dish(dish_details, component_name, quantity)
+                break
+            try:
+                self.food_menu.add_dish(dish_details, component_name)
+                break
+            except exceptions.DishAlreadyExistError:
+                print("there is already a dish by this name, try again")
 
 class RemoveDishes(Menu):
     def __init__(self, title: str, menu:food_menu.Menu) -> None:
@@ -328,13 +333,14 @@ class ManageReservations(Menu):
                 break
             except exceptions.ReservationNotFoundError:
                 print("reservation id does not exist, try again")
-        ManageExistingReservation("add dishes to reservation", reservation, self.restaurant.reservations.menu).run()
+        ManageExistingReservation("add dishes to reservation", reservation, self.restaurant.reservations).run()
 
 class ManageExistingReservation(Menu):
-    def __init__(self, title: str, reservation:Reservation, menu:food_menu.Menu) -> None:
+    def __init__(self, title: str, reservation:Reservation, reservations:Reservations) -> None:
         super().__init__(title)
         self.reservation = reservation
-        self.food_menu = menu
+        self.reservations = reservations
+        self.food_menu = reservations.menu
         self.io = AppIO()
         self.add_option("a", "order a first course", lambda : self.order_else("first_course"))
         self.add_option("b", "order a main course", lambda : self.order_else("main_course"))
@@ -356,7 +362,7 @@ class ManageExistingReservation(Menu):
                 special_case = spec_cases.get(component_name)
                 if special_case:
                     dish = special_case(dish)
-                self.reservation.add_order(dish)
+                self.reservations.add_order(self.reservation.id, dish)
                 print(f"{name} added to reservation")
                 if component_name == "first_course":
                     bread = self.io.get_bool_input("will you like to add bread to this course? ")
@@ -365,6 +371,9 @@ class ManageExistingReservation(Menu):
                 break
             except exceptions.DishNotExistError:
                 print("there is no dish by that name, try again")
+                suggestions = self.food_menu.search_dishes(name, component_name)
+                if suggestions:
+                    print(f"did you mean: {', '.join(suggestions)}")
 
     def set_up_desert(self, desert):
         sugar = self.io.get_bool_input("with sugar?")
@@ -382,24 +391,34 @@ class ManageExistingReservation(Menu):
         while True:
             try:
                 name = self.io.get_name("enter the bread's name")
-                bread_inv:BreadInventory = self.food_menu.bread.get_bread_by_name(name) 
+                bread_inv:BreadInventory = self.food_menu.bread.get_bread_by_name(name)
+                # a loaf is only sold to a reservation that is there to order it
+                self.reservations._get_active_reservation(self.reservation.id)
                 bread:Bread = self.food_menu.bread.order_bread(bread_inv)
-                self.reservation.add_order(bread)
+                try:
+                    self.reservations.add_order(self.reservation.id, bread)
+                except exceptions.ReservationNotFoundError:
+                    # cancelled or archived between the check and the order
+                    self.food_menu.bread.release(bread.name, 1)
+                    raise
                 print(f"{name} added to reservation")
                 break
             except exceptions.DishNotExistError:
                 print("there is no bread by that name, try again")
+            except exceptions.ReservationNotFoundError:
+                print("this reservation was cancelled or is over, the bread wasn't ordered")
+                break
 
     def add_special_comments(self):
         comment = self.io.get_input("enter your comment here.")
-        self.reservation.add_comment(comment)
+        self.reservations.add_comment(self.reservation.id, comment)
 
     def get_bill(self):
         meal = self.reservation.get_meal_list()
         if not meal:
             print("this reservation didn't order anything yet")
             return
-        billing = Bill(meal)
+        billing = Bill(meal, subtotal = self.reservation.subtotal)
         overall_bill:BillDetails = billing.overall()
         self.print_bill(overall_bill)
     
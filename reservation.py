@@ -1,9 +1,24 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from collections.abc import Iterator
+import heapq
+import threading
+from typing import TYPE_CHECKING
 import tables
 import food_menu
 import exceptions
+from slot_calendar import SlotCalendar
+from timeutil import to_minutes, MINUTE
+from storage import ReservationStore, MemoryReservationStore
+from reservation_archive import ArchivedRecord
+from id_allocator import IdAllocator, CounterIdAllocator
 from pydantic.dataclasses import dataclass
-from courses import Dish
+from courses import Dish, OrderLine
+if TYPE_CHECKING:
+    from journal import RestaurantJournal
+
+DEFAULT_SLOT_STEP = 15
+DAY = timedelta(days = 1)
+BOOKING_RETRIES = 3
 
 @dataclass
 class ReservationDetails:
@@ -13,6 +28,7 @@ class ReservationDetails:
     duration:timedelta
 
 class Reservation:
+    __slots__ = ("id", "name", "table_num", "start", "duration", "_meal", "_comments", "subtotal", "_section_subtotals", "__weakref__")
     def __init__(
                 self, 
                 id:int,
@@ -24,16 +40,41 @@ class Reservation:
         self.id:int = id
         self.name = name
         self.table_num:int = table_num
-        self.meal:list = []
-        self.comments:list[str] = []
+        # most reservations never order or comment, the lists are made on first use
+        self._meal:list | None = None
+        self._comments:list[str] | None = None
+        # running bill, kept up to date by add_order
+        self.subtotal:float = 0
+        self._section_subtotals:dict[str | None, float] | None = None
         self.start:datetime = start
         self.duration:timedelta = duration
     @property
     def end(self) -> datetime:
         return self.start + self.duration
+
+    @property
+    def meal(self) -> list:
+        if self._meal is None:
+            self._meal = []
+        return self._meal
+
+    @property
+    def comments(self) -> list[str]:
+        if self._comments is None:
+            self._comments = []
+        return self._comments
     
-    def add_order(self, dish:Dish):
+    @property
+    def section_subtotals(self) -> dict[str | None, float]:
+        return dict(self._section_subtotals or {})
+
+    def add_order(self, dish:Dish | OrderLine):
         self.meal.append(dish)
+        price = dish.price
+        self.subtotal += price
+        if self._section_subtotals is None:
+            self._section_subtotals = {}
+        self._section_subtotals[dish.section] = self._section_subtotals.get(dish.section, 0) + price
 
     def add_comment(self, comment:str):
         self.comments.append(comment)
@@ -42,71 +83,281 @@ class Reservation:
         return self.meal
 
     def __str__(self) -> str:
-        meal = "\n".join([dish.name for dish in self.meal]) or "no dishes"
+        meal = "\n".join([dish.name for dish in self._meal or ()]) or "no dishes"
         start = self.start.strftime("%Y-%m-%d %H:%M")
         end = self.end.strftime("%H:%M")
         no_special_comments = "no special comments"
         special_comments = "special comments: "
-        comments = "\n".join(self.comments)
+        comments = "\n".join(self._comments or ())
         return f"reservation id. {self.id}\n"\
             f"name. {self.name}\n"\
             f"table number {self.table_num}\n"\
             f"from {start} to {end}\n"\
             f"ordered: {meal}\n" \
-            f"{no_special_comments if len(self.comments) == 0 else special_comments}.\n"\
-            f"{comments if len(self.comments) > 0 else ''}"
+            f"{special_comments if self._comments else no_special_comments}.\n"\
+            f"{comments}"
 
 class Reservations:
-    def __init__(self, tables:tables.Tables, menu:food_menu.Menu) -> None:
-        self._id_count = 1
+    def __init__(
+                self,
+                tables:tables.Tables,
+                menu:food_menu.Menu,
+                min_meal_time:timedelta = timedelta(0),
+                id_allocator:IdAllocator | None = None,
+                store:ReservationStore | None = None,
+                ) -> None:
+        self.id_allocator = id_allocator or CounterIdAllocator()
         self.tables = tables
         self.menu = menu
-        self.collection:list[Reservation] = []
+        self.min_meal_time = min_meal_time
+        self.store = store if store is not None else MemoryReservationStore()
+        # archived ids count too, they are still looked up by id
+        self.id_allocator.advance(self.store.max_id())
+        self.calendar:SlotCalendar | None = None
+        # every change happens under the lock and bumps the version, a booking
+        # searches without the lock and only re-checks its table if the version moved
+        self._lock = threading.RLock()
+        self._version = 0
+        self.journal:RestaurantJournal | None = None
+
+    def __len__(self) -> int:
+        return len(self.store)
 
     def _next_id(self) -> int:
-        _id = self._id_count
-        self._id_count += 1
-        return _id
+        return self.id_allocator.next_id()
 
     def _create_reservation(self, name:str, table_num:int, start:datetime, duration:timedelta) -> Reservation:
         return Reservation(id = self._next_id(),name = name, table_num = table_num, start = start, duration = duration)
     
     def _add_reservation(self, entry) -> None:
-        self.collection.append(entry)
+        self.store.add(entry)
+        if self.calendar:
+            self.calendar.book(entry.table_num, entry.start, entry.end)
+        self._version += 1
+
+    def restore(self, entries:list[Reservation], archived:list[ArchivedRecord] | None = None) -> None:
+        """
+        puts back reservations that were already booked, as they are and 
+        without looking for tables, e.g. when loading a saved restaurant.
+        entries are expected in booking order
+        """
+        if archived is None:
+            archived = []
+        with self._lock:
+            self.store.add_many(entries)
+            if self.calendar:
+                for entry in entries:
+                    self.calendar.book(entry.table_num, entry.start, entry.end)
+            self.store.add_archived(archived)
+            ids = [entry.id for entry in entries] + [record[0] for record in archived]
+            if ids:
+                self.id_allocator.advance(max(ids))
+            self._version += 1
+
+    def _remove_reservation(self, entry:Reservation) -> None:
+        self.store.remove(entry)
+        self._release_slots(entry)
+        self._version += 1
+
+    def _release_slots(self, entry:Reservation) -> None:
+        if self.calendar:
+            # a day before and after is enough to cover every day the reservation touched
+            timeline = self.store.timeline(entry.table_num, entry.start - DAY, entry.end + DAY)
+            self.calendar.release(entry.table_num, entry.start, entry.end, timeline)
 
     def get_all_reservations(self) -> list[Reservation]:
-        return self.collection
+        return self.store.all()
     def get_reservations_by_table(self, table_num:int) -> list[Reservation]:
-        return [r for r in self.collection if r.table_num == table_num]
+        return self.store.by_table(table_num)
     def get_reservations_by_start(self, start:datetime) -> list[Reservation]:
-        return [r for r in self.collection if r.start == start]
+        return self.store.by_start(start)
     def get_reservations_by_name(self, name:str) -> list[Reservation]:
-        return [r for r in self.collection if r.name == name]
+        active = self.store.by_name(name)
+        archived = [self._from_archive(record) for record in self.store.archived_by_name(name)]
+        if not archived:
+            return active
+        return sorted(archived + active, key = lambda r: r.id)
+    def get_reservations_by_day(self, day:date) -> list[Reservation]:
+        return self.store.by_day(day)
     def get_reservation_by_id(self, id:int) -> Reservation:
         try:
-            return next(r for r in self.collection if r.id == id)
-        except StopIteration:
+            return self._get_active_reservation(id)
+        except exceptions.ReservationNotFoundError:
+            record = self.store.get_archived(id)
+            if record is None:
+                raise
+            return self._from_archive(record)
+    def _get_active_reservation(self, id:int) -> Reservation:
+        reservation = self.store.get(id)
+        if reservation is None:
             raise exceptions.ReservationNotFoundError
+        return reservation
+    def iter_records(
+                self,
+                after:datetime | None = None,
+                before:datetime | None = None,
+                include_archived:bool = True,
+                ) -> Iterator[ArchivedRecord]:
+        """
+        every reservation starting in [after, before) as the archive keeps
+        them, (id, name, table, start, duration, meal, comments). the archived
+        ones come first and then the active ones day by day, so only one
+        day is held at a time however many reservations there are
+        """
+        if include_archived:
+            yield from self.store.iter_archived(after, before)
+        day = self.store.first_day(after.date() if after is not None else date.min)
+        while day is not None and (before is None or day <= before.date()):
+            with self._lock:
+                records = [
+                    (r.id, r.name, r.table_num, r.start, r.duration, tuple(r._meal or ()), tuple(r._comments or ()))
+                    for r in self.store.by_day(day)
+                    if (after is None or r.start >= after) and (before is None or r.start < before)
+                    ]
+            records.sort(key = lambda record: (record[3], record[0]))
+            yield from records
+            day = self.store.first_day(day + DAY) if day < date.max else None
+
+    def get_reservations_between(self, start:datetime, end:datetime) -> list[Reservation]:
+        with self._lock:
+            return self.store.overlapping(start, end)
+    def count_reservations_by_table(self) -> dict[int, int]:
+        with self._lock:
+            return self.store.count_by_table()
     
-    def _check_overlaps(self, reservation:Reservation, start:datetime, end:datetime):
-        return reservation.start < end and start < reservation.end
-        
-    def _check_availability_by_date(self, reservations:list[Reservation], start, end) -> bool:
-        for reservation in reservations:
-            overlaps = self._check_overlaps(reservation, start, end)
-            if overlaps:
-                return False
-        return True
+    def _from_archive(self, record:ArchivedRecord) -> Reservation:
+        id, name, table_num, start, duration, meal, comments = record
+        reservation = Reservation(id = id, name = name, table_num = table_num, start = start, duration = duration)
+        for dish in meal:
+            reservation.add_order(dish)
+        if comments:
+            reservation.comments.extend(comments)
+        return reservation
+
+    def archive_finished(self, now:datetime) -> int:
+        """
+        moves every reservation that ended by `now` out of the booking
+        indexes into the archive, they can still be looked up by id and name
+
+        Returns:
+            int: number of archived reservations
+        """
+        with self._lock:
+            finished = self.store.finished_by(now)
+            if finished and self.journal:
+                self.journal.record("archive_finished", now = to_minutes(now))
+            self.store.archive(finished)
+            for reservation in finished:
+                self._release_slots(reservation)
+            self._version += 1
+            return len(finished)
+
+    def enable_slot_calendar(self, slot_minutes:int) -> None:
+        """
+        answers availability checks that start and end on a slot boundary
+        from per table bitsets, other checks keep using the interval index
+        """
+        with self._lock:
+            calendar = SlotCalendar(slot_minutes)
+            for entry in self.store.all():
+                calendar.book(entry.table_num, entry.start, entry.end)
+            self.calendar = calendar
+
+    def disable_slot_calendar(self) -> None:
+        self.calendar = None
+
+    def get_day_availability(self, day:date) -> dict[int, list[bool]]:
+        if self.calendar is None:
+            raise ValueError("slot calendar is not enabled")
+        return self.calendar.availability_matrix(day, list(self.tables.collection))
+
+    def _is_table_free(self, table_num:int, start:datetime, end:datetime) -> bool:
+        calendar = self.calendar
+        if calendar and calendar.is_aligned(start) and calendar.is_aligned(end):
+            return calendar.is_free(table_num, start, end)
+        return self.store.is_table_free(table_num, start, end)
     
-    def get_available_table(self, sits:int, start:datetime, end:datetime) -> tables.Table:
-        suitable_tables:list[tables.Table] = self.tables.get_table_by_sits(sits)
+    def _first_free_table(self, suitable_tables:list[tables.Table], start:datetime, end:datetime) -> tables.Table:
         for table in suitable_tables:
-            active_reservations = self.get_reservations_by_table(table.number)
-            is_available = self._check_availability_by_date(active_reservations, start, end)
-            if is_available is True:
+            if self._is_table_free(table.number, start, end):
                 return table
         raise exceptions.NoAvailableTablesError
 
+    def get_available_table(self, sits:int, start:datetime, end:datetime) -> tables.Table:
+        suitable_tables:list[tables.Table] = self.tables.get_table_by_sits(sits)
+        return self._first_free_table(suitable_tables, start, end)
+
+    def _free_starts(self, table_num:int, duration:timedelta, after:datetime, until:datetime, step:timedelta) -> Iterator[datetime]:
+        timeline = self.store.timeline(table_num, after, until + duration)
+        i = 0
+        start = after
+        while start <= until:
+            while i < len(timeline) and timeline[i][1] <= start:
+                i += 1
+            if i < len(timeline) and timeline[i][0] < start + duration:
+                # jump to the first step that starts once the blocking reservation is over
+                start = after - (after - timeline[i][1]) // step * step
+                continue
+            yield start
+            start += step
+
+    def _check_search(self, duration:timedelta, step:timedelta) -> None:
+        if duration < self.min_meal_time:
+            raise ValueError(f"duration cannot be less than {self.min_meal_time}")
+        if step <= timedelta(0):
+            raise ValueError("step has to be positive")
+
+    def find_next_available(
+                self,
+                sits:int,
+                duration:timedelta,
+                after:datetime,
+                until:datetime,
+                step:timedelta = timedelta(minutes = DEFAULT_SLOT_STEP),
+                ) -> tuple[datetime, tables.Table]:
+        """
+        finds the earliest start, on the `step` grid from `after` up to `until`,
+        at which a table for `sits` is free for `duration`
+
+        Returns:
+            tuple[datetime, tables.Table]: the start and the table that would be booked
+        """
+        self._check_search(duration, step)
+        best:tuple[datetime, tables.Table] | None = None
+        for table in self.tables.get_table_by_sits(sits):
+            start = next(self._free_starts(table.number, duration, after, until, step), None)
+            if start is not None and (best is None or start < best[0]):
+                best = (start, table)
+        if best is None:
+            raise exceptions.NoAvailableTablesError
+        return best
+
+    def find_next_available_options(
+                self,
+                sits:int,
+                duration:timedelta,
+                after:datetime,
+                until:datetime,
+                k:int,
+                step:timedelta = timedelta(minutes = DEFAULT_SLOT_STEP),
+                ) -> list[tuple[datetime, tables.Table]]:
+        """
+        same search as find_next_available but returns up to `k` different
+        start times, each with the table that would be booked for it
+        """
+        self._check_search(duration, step)
+        def table_slots(rank:int, table:tables.Table) -> Iterator[tuple[datetime, int, tables.Table]]:
+            for start in self._free_starts(table.number, duration, after, until, step):
+                yield start, rank, table
+        suitable_tables = self.tables.get_table_by_sits(sits)
+        options:list[tuple[datetime, tables.Table]] = []
+        for start, _, table in heapq.merge(*[table_slots(rank, t) for rank, t in enumerate(suitable_tables)]):
+            if len(options) == k:
+                break
+            if not options or options[-1][0] != start:
+                options.append((start, table))
+        return options
+
     def new_reservation(self,reserv_details:ReservationDetails) -> Reservation:
         """
         looks for available tables at the time specified 
@@ -122,21 +373,89 @@ class Reservations:
             Reservation: the reservation object
         """
         end = reserv_details.start + reserv_details.duration
-        
-        table = self.get_available_table(reserv_details.sits, reserv_details.start, end)
+        for _ in range(BOOKING_RETRIES):
+            version = self._version
+            try:
+                table = self.get_available_table(reserv_details.sits, reserv_details.start, end)
+            except exceptions.NoAvailableTablesError:
+                if self._version == version:
+                    raise
+                continue
+            with self._lock:
+                if self._version == version or self._is_table_free(table.number, reserv_details.start, end):
+                    return self._book(reserv_details, table)
+        # too busy to book optimistically, search again holding the lock
+        with self._lock:
+            table = self.get_available_table(reserv_details.sits, reserv_details.start, end)
+            return self._book(reserv_details, table)
+
+    def _book(self, reserv_details:ReservationDetails, table:tables.Table) -> Reservation:
         reservation = self._create_reservation(reserv_details.name, table.number, reserv_details.start, reserv_details.duration)
+        # the record is made first, a start it can't hold fails before the store is touched
+        record = dict(
+            id = reservation.id,
+            name = reservation.name,
+            table = reservation.table_num,
+            start = to_minutes(reservation.start),
+            duration = reservation.duration // MINUTE,
+            )
         self._add_reservation(reservation)
+        if self.journal:
+            self.journal.record("new_reservation", **record)
         return reservation
     
+    def new_reservations_bulk(self, batch:list[ReservationDetails]) -> list[Reservation | exceptions.NoAvailableTablesError]:
+        """
+        books a whole batch of reservations in one sweep, the batch is
+        handled in start time order (ties keep their batch order) with the 
+        same table choice new_reservation would make for each of them
+
+        Args:
+            batch (list[ReservationDetails]): the reservations to book
+
+        Returns:
+            list: per batch item, the created reservation or the
+            NoAvailableTablesError it failed with
+        """
+        results:list = [None] * len(batch)
+        suitable_by_sits:dict[int, list[tables.Table]] = {}
+        with self._lock:
+            for i in sorted(range(len(batch)), key = lambda i: batch[i].start):
+                details = batch[i]
+                suitable_tables = suitable_by_sits.get(details.sits)
+                if suitable_tables is None:
+                    suitable_tables = suitable_by_sits[details.sits] = self.tables.get_table_by_sits(details.sits)
+                try:
+                    table = self._first_free_table(suitable_tables, details.start, details.start + details.duration)
+                except exceptions.NoAvailableTablesError as error:
+                    results[i] = error
+                    continue
+                results[i] = self._book(details, table)
+        return results
+
     def cancel_reservation(self, reservation_id:int) -> None:
-        reservation = self.get_reservation_by_id(reservation_id)
-        self.collection.remove(reservation)
+        with self._lock:
+            reservation = self._get_active_reservation(reservation_id)
+            self._remove_reservation(reservation)
+            if self.journal:
+                self.journal.record("cancel_reservation", id = reservation_id)
         return None
     
     def order_dish(self, reservation_id:int, dish_name:str, section:str)->None:
-        reservation = self.get_reservation_by_id(reservation_id)
         dish = self.menu.get_dish_by_name(section, dish_name)
-        reservation.meal.append(dish)
+        self.add_order(reservation_id, dish)
+
+    def add_order(self, reservation_id:int, dish:Dish | OrderLine) -> None:
+        with self._lock:
+            self.store.add_order(self._get_active_reservation(reservation_id), dish)
+            if self.journal:
+                self.journal.record_order(reservation_id, dish)
+
+    def add_comment(self, reservation_id:int, comment:str) -> None:
+        with self._lock:
+            self.store.add_comment(self._get_active_reservation(reservation_id), comment)
+            if self.journal:
+                self.journal.record("add_comment", id = reservation_id, comment = comment)
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
@@ -0,0 +1,79 @@
+import sys
+from collections.abc import Iterator
+from array import array
+from datetime import datetime, timedelta
+from timeutil import to_minutes, from_minutes, MINUTE
+
+ArchivedRecord = tuple[int, str, int, datetime, timedelta, tuple, tuple]
+
+class ReservationArchive:
+    """
+    cold store for reservations that are already over, kept as
+    int columns plus interned names so they cost a fraction of a
+    Reservation object and stay out of the booking indexes
+    """
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.tables = array("q")
+        self.starts = array("q")
+        self.durations = array("q")
+        self.names:list[str] = []
+        # most reservations have no meal or comments so only the ones that do are kept
+        self.meals:dict[int, tuple] = {}
+        self.comments:dict[int, tuple[str, ...]] = {}
+        self.rows:dict[int, int] = {}
+        self.rows_by_name:dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, reservation_id:int) -> bool:
+        return reservation_id in self.rows
+
+    def add(self, reservation_id:int, name:str, table_num:int, start:datetime, duration:timedelta, meal:list | None, comments:list[str] | None) -> None:
+        row = len(self.ids)
+        name = sys.intern(name)
+        self.rows[reservation_id] = row
+        self.rows_by_name.setdefault(name, []).append(row)
+        self.ids.append(reservation_id)
+        self.tables.append(table_num)
+        self.starts.append(to_minutes(start))
+        self.durations.append(duration // MINUTE)
+        self.names.append(name)
+        if meal:
+            self.meals[row] = tuple(meal)
+        if comments:
+            self.comments[row] = tuple(comments)
+
+    def _record(self, row:int) -> ArchivedRecord:
+        return (
+            self.ids[row],
+            self.names[row],
+            self.tables[row],
+            from_minutes(self.starts[row]),
+            self.durations[row] * MINUTE,
+            self.meals.get(row, ()),
+            self.comments.get(row, ()),
+            )
+
+    def get(self, reservation_id:int) -> ArchivedRecord | None:
+        row = self.rows.get(reservation_id)
+        return None if row is None else self._record(row)
+
+    def get_by_name(self, name:str) -> list[ArchivedRecord]:
+        return [self._record(row) for row in self.rows_by_name.get(name, [])]
+
+    def iter_records(self, after:datetime | None = None, before:datetime | None = None) -> Iterator[ArchivedRecord]:
+        """
+        the archived reservations starting in [after, before) in the order
+        they were archived, rows archived while iterating are included
+        """
+        low = to_minutes(after) if after is not None else None
+        high = to_minutes(before) if before is not None else None
+        starts = self.starts
+        row = 0
+        while row < len(starts):
+            start = starts[row]
+            if (low is None or start >= low) and (high is None or start < high):
+                yield self._record(row)
+            row += 1
@@ -0,0 +1,183 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from slot_calendar import MINUTES_IN_DAY
+
+class ReservationColumns:
+    """
+    struct of arrays of the booked reservations: id, table, epoch minute
+    start and end and an interned name, one row per reservation. rows are
+    removed by moving the last row into the hole.
+
+    every table also keeps its own start, end and id columns sorted by
+    start. a table never holds overlapping reservations so its ends are
+    sorted as well and overlap checks are two bisects. the ids are kept
+    per start day and per name for the lookups
+    """
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.tables = array("q")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.name_rows = array("q")
+        self.names:list[str] = []
+        self._name_row:dict[str, int] = {}
+        self.rows:dict[int, int] = {}
+        self._table_starts:dict[int, array] = {}
+        self._table_ends:dict[int, array] = {}
+        self._table_ids:dict[int, array] = {}
+        # day numbers since the epoch, kept sorted
+        self.days:list[int] = []
+        self._day_ids:dict[int, array] = {}
+        self._name_ids:dict[int, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, reservation_id:int) -> bool:
+        return reservation_id in self.rows
+
+    def _intern(self, name:str) -> int:
+        name_row = self._name_row.get(name)
+        if name_row is None:
+            name_row = self._name_row[name] = len(self.names)
+            self.names.append(name)
+        return name_row
+
+    def _append_row(self, reservation_id:int, table_num:int, start:int, end:int, name:str) -> None:
+        name_row = self._intern(name)
+        self.rows[reservation_id] = len(self.ids)
+        self.ids.append(reservation_id)
+        self.tables.append(table_num)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.name_rows.append(name_row)
+        day = start // MINUTES_IN_DAY
+        day_ids = self._day_ids.get(day)
+        if day_ids is None:
+            day_ids = self._day_ids[day] = array("q")
+            insort(self.days, day)
+        day_ids.append(reservation_id)
+        self._name_ids.setdefault(name_row, array("q")).append(reservation_id)
+
+    def append(self, reservation_id:int, table_num:int, start:int, end:int, name:str) -> None:
+        self._append_row(reservation_id, table_num, start, end, name)
+        starts = self._table_starts.setdefault(table_num, array("q"))
+        ends = self._table_ends.setdefault(table_num, array("q"))
+        # same order as sorting (start, end) pairs, an empty reservation goes first
+        i = bisect_right(ends, end, bisect_left(starts, start), bisect_right(starts, start))
+        starts.insert(i, start)
+        ends.insert(i, end)
+        self._table_ids.setdefault(table_num, array("q")).insert(i, reservation_id)
+
+    def extend(self, rows:list[tuple[int, int, int, int, str]]) -> None:
+        """
+        appends (id, table, start, end, name) rows, the tables they land on are sorted once
+        """
+        touched:set[int] = set()
+        for reservation_id, table_num, start, end, name in rows:
+            self._append_row(reservation_id, table_num, start, end, name)
+            self._table_starts.setdefault(table_num, array("q")).append(start)
+            self._table_ends.setdefault(table_num, array("q")).append(end)
+            self._table_ids.setdefault(table_num, array("q")).append(reservation_id)
+            touched.add(table_num)
+        # sorting once is cheaper than an insert per row
+        for table_num in touched:
+            timeline = sorted(zip(self._table_starts[table_num], self._table_ends[table_num], self._table_ids[table_num]))
+            self._table_starts[table_num] = array("q", [start for start, _, _ in timeline])
+            self._table_ends[table_num] = array("q", [end for _, end, _ in timeline])
+            self._table_ids[table_num] = array("q", [reservation_id for _, _, reservation_id in timeline])
+
+    def remove(self, reservation_id:int) -> None:
+        row = self.rows.pop(reservation_id)
+        table_num, start, name_row = self.tables[row], self.starts[row], self.name_rows[row]
+        last = len(self.ids) - 1
+        columns = (self.ids, self.tables, self.starts, self.ends, self.name_rows)
+        if row != last:
+            for column in columns:
+                column[row] = column[last]
+            self.rows[self.ids[row]] = row
+        for column in columns:
+            column.pop()
+        starts, ids = self._table_starts[table_num], self._table_ids[table_num]
+        i = bisect_left(starts, start)
+        while ids[i] != reservation_id:
+            i += 1
+        for column in (starts, self._table_ends[table_num], ids):
+            column.pop(i)
+        day = start // MINUTES_IN_DAY
+        day_ids = self._day_ids[day]
+        day_ids.remove(reservation_id)
+        if not day_ids:
+            del self._day_ids[day]
+            self.days.pop(bisect_left(self.days, day))
+        name_ids = self._name_ids[name_row]
+        name_ids.remove(reservation_id)
+        if not name_ids:
+            del self._name_ids[name_row]
+
+    def row(self, reservation_id:int) -> tuple[int, int, int, str]:
+        """
+        Returns:
+            tuple[int, int, int, str]: the table, start, end and name of a reservation
+        """
+        row = self.rows[reservation_id]
+        return self.tables[row], self.starts[row], self.ends[row], self.names[self.name_rows[row]]
+
+    def is_free(self, table_num:int, start:int, end:int) -> bool:
+        starts = self._table_starts.get(table_num)
+        if not starts:
+            return True
+        # the last reservation starting before `end` has the latest end of all of them
+        i = bisect_left(starts, end)
+        return i == 0 or self._table_ends[table_num][i - 1] <= start
+
+    def _span(self, table_num:int, after:int, before:int) -> tuple[int, int]:
+        # the rows of a table ending after `after` and starting before `before`
+        return bisect_right(self._table_ends[table_num], after), bisect_left(self._table_starts[table_num], before)
+
+    def timeline(self, table_num:int, after:int, before:int) -> list[tuple[int, int, int]]:
+        """
+        (start, end, id) of the table's reservations overlapping [after, before), sorted by start
+        """
+        if table_num not in self._table_starts:
+            return []
+        first, last = self._span(table_num, after, before)
+        return list(zip(self._table_starts[table_num][first:last], self._table_ends[table_num][first:last], self._table_ids[table_num][first:last]))
+
+    def overlapping(self, start:int, end:int) -> list[int]:
+        """
+        ids of the reservations overlapping [start, end) in id order
+        """
+        found = array("q")
+        for table_num, ids in self._table_ids.items():
+            first, last = self._span(table_num, start, end)
+            found.extend(ids[first:last])
+        return sorted(found)
+
+    def count_by_table(self) -> dict[int, int]:
+        return {table_num : len(ids) for table_num, ids in self._table_ids.items() if ids}
+
+    def by_table(self, table_num:int) -> list[int]:
+        return sorted(self._table_ids.get(table_num, ()))
+
+    def by_day(self, day:int) -> list[int]:
+        return list(self._day_ids.get(day, ()))
+
+    def by_start(self, start:int) -> list[int]:
+        starts, rows = self.starts, self.rows
+        return [i for i in self._day_ids.get(start // MINUTES_IN_DAY, ()) if starts[rows[i]] == start]
+
+    def by_name(self, name:str) -> list[int]:
+        name_row = self._name_row.get(name)
+        return [] if name_row is None else list(self._name_ids.get(name_row, ()))
+
+    def first_day(self, after:int) -> int | None:
+        i = bisect_left(self.days, after)
+        return self.days[i] if i < len(self.days) else None
+
+    def finished_by(self, now:int) -> list[int]:
+        ends, rows = self.ends, self.rows
+        finished = []
+        for day in self.days[:bisect_right(self.days, now // MINUTES_IN_DAY)]:
+            finished.extend(i for i in self._day_ids[day] if ends[rows[i]] <= now)
+        return finished
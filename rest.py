@@ -2,40 +2,94 @@ from __future__ import annotations
 import tables
 import reservation
 import food_menu
+import bill
 from datetime import timedelta
 import exceptions
+from typing import TYPE_CHECKING
+from id_allocator import IdAllocator, AllocatorFactory
+from storage import Storage, MemoryStorage
+if TYPE_CHECKING:
+    from journal import Journal, RestaurantJournal
 
 DEFAULT_MIN_MEAL_TIME = 30
  
 class Restaurant:
-    def __init__(self, name, min_meal_time:timedelta = timedelta(minutes = DEFAULT_MIN_MEAL_TIME)) -> None:
+    def __init__(
+                self,
+                name,
+                min_meal_time:timedelta = timedelta(minutes = DEFAULT_MIN_MEAL_TIME),
+                id_allocator:IdAllocator | None = None,
+                storage:Storage | None = None,
+                ) -> None:
         self.name = name
-        self.menu = food_menu.Menu()
-        self.tables = tables.Tables()
-        self.reservations = reservation.Reservations(self.tables, self.menu)
+        storage = storage or MemoryStorage()
+        self.menu = food_menu.Menu(storage.menu_store(name))
+        self.tables = tables.Tables(store = storage.table_store(name))
         self.min_meal_time = min_meal_time
+        self.reservations = reservation.Reservations(
+            self.tables,
+            self.menu,
+            self.min_meal_time,
+            id_allocator,
+            storage.reservation_store(name, self.menu),
+            )
     def __str__(self) -> str:
         return f"{self.name}"
+    def attach_journal(self, journal:RestaurantJournal | None) -> None:
+        self.tables.journal = journal
+        self.menu.journal = journal
+        self.menu.bread.journal = journal
+        self.reservations.journal = journal
+    def settle(self, tax:float = bill.DEFAULT_TAX_PERCENT, tip:float = bill.DEFAULT_TIP_PERCENT) -> dict[int, bill.SettledBill]:
+        # archived reservations were eaten and paid for too
+        meals = ((record[0], list(record[5])) for record in self.reservations.iter_records())
+        return bill.settle(meals, tax, tip)
 
 class Restaurants:
-    def __init__(self) -> None:
-        self.collection:list[Restaurant] = []
-    def _create_restaurant(self, name):
-        return Restaurant(name)
+    def __init__(self, storage:Storage | None = None, id_allocators:AllocatorFactory | None = None) -> None:
+        """
+        Args:
+            id_allocators (AllocatorFactory | None): makes the id allocator of every
+                restaurant from its name, each restaurant counts ids in memory without it
+        """
+        self.storage = storage or MemoryStorage()
+        self.id_allocators = id_allocators
+        self.collection:list[Restaurant] = [self._create_restaurant(name) for name in self.storage.restaurant_names()]
+        self.journal:Journal | None = None
+    def _create_restaurant(self, name, min_meal_time:timedelta = timedelta(minutes = DEFAULT_MIN_MEAL_TIME)):
+        id_allocator = self.id_allocators(name) if self.id_allocators else None
+        return Restaurant(name, min_meal_time, id_allocator, self.storage)
     def add_restaurant(self, name):
         if name not in [r.name for r in self.collection]:
-            self.collection.append(self._create_restaurant(name))
+            restaurant = self._create_restaurant(name)
+            self.collection.append(restaurant)
+            self.storage.save_restaurant(name)
+            if self.journal:
+                self.journal.record("add_restaurant", name = name)
+                restaurant.attach_journal(self.journal.bind(name))
         else:
             raise exceptions.RestaurantAlreadyExistsError
     def delete_restaurant_by_name(self, name:str) -> None:
         restaurant = self.get_restaurant_by_name(name)
         self.collection.remove(restaurant)
+        self.storage.delete_restaurant(name)
+        if self.journal:
+            self.journal.record("delete_restaurant", name = name)
+    def attach_journal(self, journal:Journal | None) -> None:
+        """
+        records every change of the restaurants in `journal` from now on, None stops it
+        """
+        self.journal = journal
+        for restaurant in self.collection:
+            restaurant.attach_journal(journal.bind(restaurant.name) if journal else None)
            
     def __str__(self) -> str:
         if len(self.collection) == 0:
             return "\nthere are no restaurants at the moment"
         lines = [f" {i}. {rest}" for i, rest in enumerate(self.collection, start = 1)]
         return "restaurants list:\n" + "\n".join(lines)
+    def settle_all(self, tax:float = bill.DEFAULT_TAX_PERCENT, tip:float = bill.DEFAULT_TIP_PERCENT) -> dict[str, dict[int, bill.SettledBill]]:
+        return {r.name : r.settle(tax, tip) for r in self.collection}
     def get_restaurant_by_name(self, name):
         try:
             return next(r for r in self.collection if r.name == name)
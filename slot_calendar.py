@@ -0,0 +1,83 @@
+from datetime import date, datetime, time, timedelta
+from bisect import bisect_right
+from collections.abc import Iterator
+
+MINUTES_IN_DAY = 24 * 60
+
+class SlotCalendar:
+    """
+    keeps every table's day as an int bitset of fixed width slots,
+    a slot is set when any reservation touches it. for start and end
+    times on a slot boundary this gives the exact same answer as the
+    interval overlap check, other times have to use the interval check
+    """
+    def __init__(self, slot_minutes:int) -> None:
+        if slot_minutes <= 0 or MINUTES_IN_DAY % slot_minutes:
+            raise ValueError("slot length has to divide a day into whole slots")
+        self.slot_minutes = slot_minutes
+        self.slot = timedelta(minutes = slot_minutes)
+        self.slots_per_day = MINUTES_IN_DAY // slot_minutes
+        self.full_day = (1 << self.slots_per_day) - 1
+        self.days:dict[tuple[int, date], int] = {}
+
+    def is_aligned(self, moment:datetime) -> bool:
+        minutes = moment.hour * 60 + moment.minute
+        return moment.second == 0 and moment.microsecond == 0 and minutes % self.slot_minutes == 0
+
+    def _day_masks(self, start:datetime, end:datetime) -> Iterator[tuple[date, int]]:
+        day = start.date()
+        while True:
+            day_start = datetime.combine(day, time(tzinfo = start.tzinfo))
+            day_end = day_start + timedelta(days = 1)
+            first_slot = (max(start, day_start) - day_start) // self.slot
+            last_slot = -((day_start - min(end, day_end)) // self.slot)
+            if last_slot > first_slot:
+                yield day, (1 << last_slot) - (1 << first_slot)
+            if end <= day_end:
+                return
+            day += timedelta(days = 1)
+
+    def book(self, table_num:int, start:datetime, end:datetime) -> None:
+        for day, mask in self._day_masks(start, end):
+            key = (table_num, day)
+            self.days[key] = self.days.get(key, 0) | mask
+
+    def release(self, table_num:int, start:datetime, end:datetime, timeline:list) -> None:
+        """
+        clears the days the reservation touched and rebuilds them from
+        the table's remaining (start, end, ...) sorted timeline, slots
+        can be shared by reservations that don't end on a slot boundary
+        """
+        for day, _ in self._day_masks(start, end):
+            day_start = datetime.combine(day, time(tzinfo = start.tzinfo))
+            day_end = day_start + timedelta(days = 1)
+            busy = 0
+            i = bisect_right(timeline, day_start, key = lambda entry: entry[1])
+            while i < len(timeline) and timeline[i][0] < day_end:
+                for other_day, mask in self._day_masks(timeline[i][0], timeline[i][1]):
+                    if other_day == day:
+                        busy |= mask
+                i += 1
+            if busy:
+                self.days[(table_num, day)] = busy
+            else:
+                self.days.pop((table_num, day), None)
+
+    def is_free(self, table_num:int, start:datetime, end:datetime) -> bool:
+        for day, mask in self._day_masks(start, end):
+            if self.days.get((table_num, day), 0) & mask:
+                return False
+        return True
+
+    def free_slots(self, day:date, table_nums:list[int]) -> dict[int, int]:
+        return {num : self.full_day & ~self.days.get((num, day), 0) for num in table_nums}
+
+    def availability_matrix(self, day:date, table_nums:list[int]) -> dict[int, list[bool]]:
+        """
+        tables x slots of the day, True where the table is free for that slot
+        """
+        matrix = {}
+        for num, free in self.free_slots(day, table_nums).items():
+            bits = format(free, f"0{self.slots_per_day}b")[::-1]
+            matrix[num] = [bit == "1" for bit in bits]
+        return matrix
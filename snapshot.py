@@ -0,0 +1,286 @@
+"""
+binary snapshots of a whole Restaurants tree.
+
+a snapshot is a fixed header, a json description of the restaurants and
+their menus, and then 8 byte aligned little endian int64 columns for the
+reservations and their orders, which are read straight out of a memory map
+"""
+import os
+import sys
+import gc
+import json
+import mmap
+import struct
+import tempfile
+from array import array
+from datetime import timedelta
+import rest
+import exceptions
+from courses import DishDetails, Dish, OrderLine, BreadInventory, ORDER_LINE_TYPES, DISH_TYPES, PLAIN_ORDER
+from reservation import Reservation, Reservations
+from timeutil import to_minutes, from_minutes, MINUTE
+from trusted import trusted
+from id_allocator import AllocatorFactory
+
+MAGIC = b"RESTSNAP"
+FORMAT_VERSION = 1
+# magic, format version, json length
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+class _ColumnWriter:
+    """
+    collects the int columns of a snapshot, the json header keeps
+    every column as [offset, length] in int64s from the first column
+    """
+    def __init__(self) -> None:
+        self.chunks:list[array] = []
+        self.length = 0
+
+    def add(self, values) -> list[int]:
+        column = array("q", values)
+        if sys.byteorder != "little":
+            column.byteswap()
+        self.chunks.append(column)
+        offset = self.length
+        self.length += len(column)
+        return [offset, len(column)]
+
+class _DishKeys:
+    """
+    numbers every dish object of a restaurant, dishes that were ordered
+    and then taken off the menu are saved as well so old orders keep them
+    """
+    def __init__(self) -> None:
+        self.keys:dict[int, int] = {}
+        self.rows:list[list] = []
+
+    def key(self, dish:Dish, quantity:int | None = None, in_menu:bool = False) -> int:
+        key = self.keys.get(id(dish))
+        if key is None:
+            key = self.keys[id(dish)] = len(self.rows)
+            self.rows.append([dish.section, dish.id, dish.name, dish.base_price, dish.description, quantity, in_menu])
+        return key
+
+def _dump_reservations(records, dish_keys:_DishKeys, columns:_ColumnWriter) -> dict:
+    """
+    Args:
+        records: (id, name, table, start, duration, meal, comments) per reservation
+    """
+    ids, tables, starts, durations, name_rows = [], [], [], [], []
+    order_rows, order_dishes, order_codes = [], [], []
+    names:dict[str, int] = {}
+    comments:dict[str, list[str]] = {}
+    for row, (reservation_id, name, table_num, start, duration, meal, reservation_comments) in enumerate(records):
+        ids.append(reservation_id)
+        tables.append(table_num)
+        starts.append(to_minutes(start))
+        durations.append(duration // MINUTE)
+        name_rows.append(names.setdefault(name, len(names)))
+        for dish in meal or ():
+            order_rows.append(row)
+            if isinstance(dish, OrderLine):
+                order_dishes.append(dish_keys.key(dish.dish))
+                order_codes.append(dish.code)
+            elif isinstance(dish, Dish):
+                order_dishes.append(dish_keys.key(dish))
+                order_codes.append(PLAIN_ORDER)
+            else:
+                raise TypeError(f"can't save an order of {type(dish).__name__}")
+        if reservation_comments:
+            comments[str(row)] = list(reservation_comments)
+    return {
+        "names" : list(names),
+        "comments" : comments,
+        "ids" : columns.add(ids),
+        "tables" : columns.add(tables),
+        "starts" : columns.add(starts),
+        "durations" : columns.add(durations),
+        "name_rows" : columns.add(name_rows),
+        "order_rows" : columns.add(order_rows),
+        "order_dishes" : columns.add(order_dishes),
+        "order_codes" : columns.add(order_codes),
+    }
+
+def _dump_restaurant(restaurant:rest.Restaurant, columns:_ColumnWriter) -> dict:
+    menu = restaurant.menu
+    reservations = restaurant.reservations
+    dish_keys = _DishKeys()
+    for dish_id, (section, entry) in menu._by_id.items():
+        if isinstance(entry, BreadInventory):
+            dish_keys.key(entry.bread, entry.quantity, True)
+        else:
+            dish_keys.key(entry, None, True)
+    with reservations._lock:
+        active = [
+            (r.id, r.name, r.table_num, r.start, r.duration, r._meal, r._comments)
+            for r in reservations.get_all_reservations()
+            ]
+        archived = list(reservations.store.iter_archived())
+        calendar = reservations.calendar
+        return {
+            "name" : restaurant.name,
+            "min_meal_time" : restaurant.min_meal_time // MINUTE,
+            "tables" : [[table.number, table.sits] for table in restaurant.tables.collection.values()],
+            "best_fit" : restaurant.tables.best_fit,
+            "next_dish_id" : menu._dish_id_count,
+            "slot_minutes" : calendar.slot_minutes if calendar else None,
+            "active" : _dump_reservations(active, dish_keys, columns),
+            "archived" : _dump_reservations(archived, dish_keys, columns),
+            "dishes" : dish_keys.rows,
+        }
+
+def save(restaurants:rest.Restaurants, path:str, journal_seq:int = 0) -> None:
+    """
+    writes the snapshot next to `path` first and then moves it over,
+    so a crash while saving leaves the previous snapshot as it was.
+    journal_seq is the last journal line the snapshot holds
+    """
+    columns = _ColumnWriter()
+    header = json.dumps({
+        "journal_seq" : journal_seq,
+        "restaurants" : [_dump_restaurant(restaurant, columns) for restaurant in restaurants.collection],
+    }).encode()
+    padding = -(PREAMBLE.size + len(header)) % ALIGNMENT
+    # a name of its own, a checkpoint and a compaction may both be saving
+    descriptor, temp_path = tempfile.mkstemp(prefix = f"{os.path.basename(path)}.", suffix = ".tmp", dir = os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(descriptor, "wb") as snapshot:
+            snapshot.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            snapshot.write(header)
+            snapshot.write(b"\0" * padding)
+            for chunk in columns.chunks:
+                chunk.tofile(snapshot)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def _load_dishes(restaurant:rest.Restaurant, rows:list[list]) -> list[Dish]:
+    menu = restaurant.menu
+    dishes = []
+    for section, dish_id, name, price, description, quantity, in_menu in rows:
+        details = trusted(DishDetails, name = name, price = price, description = description)
+        if in_menu:
+            menu.add_dish(details, section, quantity, dish_id)
+            entry = menu.get_dish_by_id(dish_id)[1]
+            dishes.append(entry.bread if isinstance(entry, BreadInventory) else entry)
+        else:
+            dishes.append(DISH_TYPES[section](details, dish_id))
+    return dishes
+
+def _load_reservations(block:dict, column, dishes:list[Dish]) -> list[tuple]:
+    """
+    Returns:
+        list[tuple]: (id, name, table, start, duration, meal, comments) per reservation
+    """
+    names = block["names"]
+    meals:dict[int, list] = {}
+    for row, dish_key, code in zip(column(block["order_rows"]), column(block["order_dishes"]), column(block["order_codes"])):
+        dish = dishes[dish_key]
+        if code != PLAIN_ORDER:
+            dish = ORDER_LINE_TYPES[dish.section].from_code(dish, code)
+        meals.setdefault(row, []).append(dish)
+    comments = block["comments"]
+    # a handful of distinct durations and names are shared by every reservation
+    durations = {duration : duration * MINUTE for duration in set(column(block["durations"]))}
+    return [
+        (reservation_id, names[name_row], table_num, from_minutes(start), durations[duration], meals.get(row), comments.get(str(row)))
+        for row, (reservation_id, table_num, start, duration, name_row) in enumerate(zip(
+            column(block["ids"]),
+            column(block["tables"]),
+            column(block["starts"]),
+            column(block["durations"]),
+            column(block["name_rows"]),
+            ))
+        ]
+
+def _load_restaurant(restaurants:rest.Restaurants, data:dict, column) -> rest.Restaurant:
+    restaurant = restaurants._create_restaurant(data["name"], timedelta(minutes = data["min_meal_time"]))
+    restaurant.tables.best_fit = data["best_fit"]
+    for number, sits in data["tables"]:
+        restaurant.tables.add_table(number, sits)
+    dishes = _load_dishes(restaurant, data["dishes"])
+    restaurant.menu._dish_id_count = max(restaurant.menu._dish_id_count, data["next_dish_id"])
+    entries = []
+    for reservation_id, name, table_num, start, duration, meal, comments in _load_reservations(data["active"], column, dishes):
+        entry = Reservation(reservation_id, name, table_num, start, duration)
+        for dish in meal or ():
+            entry.add_order(dish)
+        if comments:
+            entry.comments.extend(comments)
+        entries.append(entry)
+    reservations:Reservations = restaurant.reservations
+    reservations.restore(entries, _load_reservations(data["archived"], column, dishes))
+    if data["slot_minutes"]:
+        reservations.enable_slot_calendar(data["slot_minutes"])
+    return restaurant
+
+def _read_header(mapped:mmap.mmap) -> tuple[dict, int]:
+    magic, version, header_length = PREAMBLE.unpack_from(mapped)
+    if magic != MAGIC:
+        raise exceptions.SnapshotError("not a restaurants snapshot")
+    if version != FORMAT_VERSION:
+        raise exceptions.SnapshotError(f"unsupported snapshot version {version}")
+    header = json.loads(mapped[PREAMBLE.size:PREAMBLE.size + header_length])
+    return header, PREAMBLE.size + header_length
+
+def _mapped(snapshot) -> mmap.mmap:
+    if os.fstat(snapshot.fileno()).st_size < PREAMBLE.size:
+        raise exceptions.SnapshotError("snapshot is truncated")
+    return mmap.mmap(snapshot.fileno(), 0, access = mmap.ACCESS_READ)
+
+def journal_position(path:str) -> int:
+    """
+    Returns:
+        int: the last journal line the snapshot at `path` holds
+    """
+    with open(path, "rb") as snapshot, _mapped(snapshot) as mapped:
+        return _read_header(mapped)[0]["journal_seq"]
+
+def load(path:str, id_allocators:AllocatorFactory | None = None) -> rest.Restaurants:
+    """
+    Args:
+        id_allocators (AllocatorFactory | None): see rest.Restaurants
+
+    Returns:
+        rest.Restaurants: the restaurants as they were saved
+
+    Raises:
+        exceptions.SnapshotError: the file isn't a snapshot this version can read
+    """
+    restaurants = rest.Restaurants(id_allocators = id_allocators)
+    # loading only allocates, collecting cycles on the way would find none
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        _load_into(restaurants, path)
+    finally:
+        if collecting:
+            gc.enable()
+    return restaurants
+
+def _load_into(restaurants:rest.Restaurants, path:str) -> None:
+    with open(path, "rb") as snapshot:
+        with _mapped(snapshot) as mapped:
+            header, first_column = _read_header(mapped)
+            first_column += -first_column % ALIGNMENT
+            last_column = first_column + (len(mapped) - first_column) // ALIGNMENT * ALIGNMENT
+            with memoryview(mapped) as view, view[first_column:last_column] as data, data.cast("q") as ints:
+                def column(bounds:list[int]) -> list[int]:
+                    offset, length = bounds
+                    if offset + length > len(ints):
+                        raise exceptions.SnapshotError("snapshot is truncated")
+                    with ints[offset:offset + length] as values:
+                        if sys.byteorder == "little":
+                            return values.tolist()
+                        swapped = array("q", values)
+                        swapped.byteswap()
+                        return swapped.tolist()
+                for restaurant_data in header["restaurants"]:
+                    restaurants.collection.append(_load_restaurant(restaurants, restaurant_data, column))
+
+if __name__ == "__main__":
+    pass
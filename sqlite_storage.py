@@ -0,0 +1,476 @@
+"""
+storage engine keeping every restaurant in one sqlite file.
+
+reservations are only kept in the file. a lookup builds a Reservation
+from its row unless the same one is still held somewhere, then that one
+is handed back. tables and dishes are written through and loaded back
+when the restaurants are created again.
+times are stored as epoch minutes like the rest of the app's columns
+"""
+from __future__ import annotations
+import sqlite3
+import queue
+import weakref
+from contextlib import contextmanager
+from collections.abc import Iterator
+from datetime import date, datetime, time
+from typing import TYPE_CHECKING
+from timeutil import to_minutes, from_minutes, MINUTE
+from courses import Dish, OrderLine, DishDetails, PLAIN_ORDER
+from storage import Storage, ReservationStore, TableStore, MenuStore, DishRow
+from slot_calendar import MINUTES_IN_DAY
+from reservation import Reservation
+from reservation_archive import ArchivedRecord
+if TYPE_CHECKING:
+    from food_menu import Menu
+
+DEFAULT_POOL_SIZE = 4
+# sqlite's own limit on parameters is 999 in older builds
+IN_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS restaurants (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS dining_tables (
+    restaurant TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    sits INTEGER NOT NULL,
+    PRIMARY KEY (restaurant, number)
+);
+CREATE TABLE IF NOT EXISTS dishes (
+    restaurant TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    description TEXT NOT NULL,
+    quantity INTEGER,
+    PRIMARY KEY (restaurant, id)
+);
+CREATE INDEX IF NOT EXISTS dishes_by_name ON dishes (restaurant, section, name);
+CREATE TABLE IF NOT EXISTS reservations (
+    restaurant TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    table_num INTEGER NOT NULL,
+    start_minute INTEGER NOT NULL,
+    end_minute INTEGER NOT NULL,
+    PRIMARY KEY (restaurant, id)
+);
+CREATE INDEX IF NOT EXISTS reservations_by_table ON reservations (restaurant, table_num, start_minute, end_minute);
+CREATE INDEX IF NOT EXISTS reservations_by_start ON reservations (restaurant, start_minute, end_minute);
+CREATE INDEX IF NOT EXISTS reservations_by_name ON reservations (restaurant, name);
+CREATE TABLE IF NOT EXISTS archived_reservations (
+    restaurant TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    table_num INTEGER NOT NULL,
+    start_minute INTEGER NOT NULL,
+    end_minute INTEGER NOT NULL,
+    PRIMARY KEY (restaurant, id)
+);
+CREATE INDEX IF NOT EXISTS archived_by_start ON archived_reservations (restaurant, start_minute);
+CREATE INDEX IF NOT EXISTS archived_by_name ON archived_reservations (restaurant, name);
+CREATE TABLE IF NOT EXISTS orders (
+    restaurant TEXT NOT NULL,
+    reservation_id INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    dish_id INTEGER,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    description TEXT NOT NULL,
+    code INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_by_reservation ON orders (restaurant, reservation_id);
+CREATE TABLE IF NOT EXISTS comments (
+    restaurant TEXT NOT NULL,
+    reservation_id INTEGER NOT NULL,
+    comment TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS comments_by_reservation ON comments (restaurant, reservation_id);
+"""
+
+RESERVATION_COLUMNS = "id, name, table_num, start_minute, end_minute"
+
+class ConnectionPool:
+    """
+    a fixed set of connections handed out one thread at a time. sqlite
+    keeps every connection's prepared statements in a cache keyed by the
+    sql text, so the stores only ever use the same constant statements
+    """
+    def __init__(self, path:str, size:int = DEFAULT_POOL_SIZE) -> None:
+        if size <= 0:
+            raise ValueError("pool size has to be positive")
+        # every connection to :memory: would be a database of its own
+        if path == ":memory:":
+            size = 1
+        self._idle:queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._connections = []
+        for _ in range(size):
+            connection = sqlite3.connect(path, timeout = 30, check_same_thread = False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._connections.append(connection)
+            self._idle.put(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        connection = self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self.connection() as connection, connection:
+            yield connection
+
+    def close(self) -> None:
+        for connection in self._connections:
+            connection.close()
+
+class SqliteStorage(Storage):
+    """
+    Args:
+        path (str): the database file, created when it doesn't exist
+        pool_size (int): connections shared by all the restaurants' stores
+    """
+    def __init__(self, path:str, pool_size:int = DEFAULT_POOL_SIZE) -> None:
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.transaction() as connection:
+            connection.executescript(SCHEMA)
+
+    def restaurant_names(self) -> list[str]:
+        with self.pool.connection() as connection:
+            return [name for name, in connection.execute("SELECT name FROM restaurants ORDER BY rowid")]
+
+    def save_restaurant(self, name:str) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute("INSERT INTO restaurants (name) VALUES (?)", (name,))
+
+    def delete_restaurant(self, name:str) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute("DELETE FROM restaurants WHERE name = ?", (name,))
+            for table in ("dining_tables", "dishes", "reservations", "archived_reservations", "orders", "comments"):
+                connection.execute(f"DELETE FROM {table} WHERE restaurant = ?", (name,))
+
+    def reservation_store(self, restaurant_name:str, menu:Menu) -> ReservationStore:
+        return SqliteReservationStore(self.pool, restaurant_name, menu)
+
+    def table_store(self, restaurant_name:str) -> TableStore:
+        return SqliteTableStore(self.pool, restaurant_name)
+
+    def menu_store(self, restaurant_name:str) -> MenuStore:
+        return SqliteMenuStore(self.pool, restaurant_name)
+
+    def close(self) -> None:
+        self.pool.close()
+
+class SqliteTableStore(TableStore):
+    def __init__(self, pool:ConnectionPool, restaurant_name:str) -> None:
+        self.pool = pool
+        self.restaurant_name = restaurant_name
+
+    def load(self) -> list[tuple[int, int]]:
+        with self.pool.connection() as connection:
+            return connection.execute(
+                "SELECT number, sits FROM dining_tables WHERE restaurant = ? ORDER BY rowid",
+                (self.restaurant_name,),
+                ).fetchall()
+
+    def save_table(self, number:int, sits:int) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute("INSERT INTO dining_tables (restaurant, number, sits) VALUES (?, ?, ?)", (self.restaurant_name, number, sits))
+
+    def delete_table(self, number:int) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute("DELETE FROM dining_tables WHERE restaurant = ? AND number = ?", (self.restaurant_name, number))
+
+class SqliteMenuStore(MenuStore):
+    def __init__(self, pool:ConnectionPool, restaurant_name:str) -> None:
+        self.pool = pool
+        self.restaurant_name = restaurant_name
+
+    def load(self) -> list[DishRow]:
+        with self.pool.connection() as connection:
+            return connection.execute(
+                "SELECT section, id, name, price, description, quantity FROM dishes WHERE restaurant = ? ORDER BY id",
+                (self.restaurant_name,),
+                ).fetchall()
+
+    def save_dish(self, section:str, dish_id:int, details:DishDetails, quantity:int | None) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute(
+                "INSERT INTO dishes (restaurant, id, section, name, price, description, quantity) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.restaurant_name, dish_id, section, details.name, details.price, details.description, quantity),
+                )
+
+    def delete_dish(self, section:str, name:str) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute("DELETE FROM dishes WHERE restaurant = ? AND section = ? AND name = ?", (self.restaurant_name, section, name))
+
+    def save_stock(self, name:str, quantity:int) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute(
+                "UPDATE dishes SET quantity = ? WHERE restaurant = ? AND section = 'bread' AND name = ?",
+                (quantity, self.restaurant_name, name),
+                )
+
+class SqliteReservationStore(ReservationStore):
+    """
+    range queries bound the start from below by the longest reservation
+    seen, so they only walk the index around the asked for times.
+
+    a reservation that is still held somewhere is handed out again instead
+    of a fresh copy, so orders and comments added later show on it
+    """
+    def __init__(self, pool:ConnectionPool, restaurant_name:str, menu:Menu) -> None:
+        self.pool = pool
+        self.restaurant_name = restaurant_name
+        self.menu = menu
+        with self.pool.connection() as connection:
+            longest, = connection.execute(
+                "SELECT MAX(end_minute - start_minute) FROM reservations WHERE restaurant = ?",
+                (self.restaurant_name,),
+                ).fetchone()
+        self._longest = longest or 0
+        self._live:weakref.WeakValueDictionary[int, Reservation] = weakref.WeakValueDictionary()
+
+    def __len__(self) -> int:
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM reservations WHERE restaurant = ?", (self.restaurant_name,)).fetchone()[0]
+
+    def add(self, entry:Reservation) -> None:
+        self.add_many([entry])
+
+    def add_many(self, entries:list[Reservation]) -> None:
+        for entry in entries:
+            self._live[entry.id] = entry
+        self._insert("reservations", [
+            (entry.id, entry.name, entry.table_num, entry.start, entry.duration, entry._meal or (), entry._comments or ())
+            for entry in entries
+            ])
+
+    def _insert(self, table:str, records:list[ArchivedRecord]) -> None:
+        rows = []
+        orders = []
+        comments = []
+        for reservation_id, name, table_num, start, duration, meal, reservation_comments in records:
+            start_minute = to_minutes(start)
+            rows.append((self.restaurant_name, reservation_id, name, table_num, start_minute, start_minute + duration // MINUTE))
+            orders.extend((self.restaurant_name, reservation_id, *self._order_fields(dish)) for dish in meal)
+            comments.extend((self.restaurant_name, reservation_id, comment) for comment in reservation_comments)
+        with self.pool.transaction() as connection:
+            connection.executemany(f"INSERT INTO {table} (restaurant, {RESERVATION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            connection.executemany(
+                "INSERT INTO orders (restaurant, reservation_id, section, dish_id, name, price, description, code) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                orders,
+                )
+            connection.executemany("INSERT INTO comments (restaurant, reservation_id, comment) VALUES (?, ?, ?)", comments)
+        if table == "reservations":
+            self._longest = max([self._longest] + [end - start for _, _, _, _, start, end in rows])
+
+    def remove(self, entry:Reservation) -> None:
+        key = (self.restaurant_name, entry.id)
+        self._live.pop(entry.id, None)
+        with self.pool.transaction() as connection:
+            connection.execute("DELETE FROM reservations WHERE restaurant = ? AND id = ?", key)
+            connection.execute("DELETE FROM orders WHERE restaurant = ? AND reservation_id = ?", key)
+            connection.execute("DELETE FROM comments WHERE restaurant = ? AND reservation_id = ?", key)
+
+    def _select(self, where:str, *params) -> list[Reservation]:
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                f"SELECT {RESERVATION_COLUMNS} FROM reservations WHERE restaurant = ? AND {where} ORDER BY id",
+                (self.restaurant_name, *params),
+                ).fetchall()
+            return self._build(connection, rows)
+
+    def _extras(self, connection:sqlite3.Connection, ids:list[int]) -> tuple[dict[int, list], dict[int, list[str]]]:
+        """
+        Returns:
+            tuple[dict[int, list], dict[int, list[str]]]: the ordered dishes and the comments by reservation id
+        """
+        meals:dict[int, list] = {}
+        comments:dict[int, list[str]] = {}
+        for first in range(0, len(ids), IN_CHUNK):
+            chunk = ids[first:first + IN_CHUNK]
+            marks = ", ".join("?" * len(chunk))
+            for reservation_id, section, dish_id, name, price, description, code in connection.execute(
+                    f"SELECT reservation_id, section, dish_id, name, price, description, code FROM orders "
+                    f"WHERE restaurant = ? AND reservation_id IN ({marks}) ORDER BY rowid",
+                    (self.restaurant_name, *chunk),
+                    ):
+                meals.setdefault(reservation_id, []).append(self.menu.resolve_order(section, dish_id, name, price, description, code))
+            for reservation_id, comment in connection.execute(
+                    f"SELECT reservation_id, comment FROM comments WHERE restaurant = ? AND reservation_id IN ({marks}) ORDER BY rowid",
+                    (self.restaurant_name, *chunk),
+                    ):
+                comments.setdefault(reservation_id, []).append(comment)
+        return meals, comments
+
+    def _build(self, connection:sqlite3.Connection, rows:list[tuple]) -> list[Reservation]:
+        found:list[Reservation | None] = [self._live.get(row[0]) for row in rows]
+        fresh = {
+            reservation_id : Reservation(reservation_id, name, table_num, from_minutes(start), (end - start) * MINUTE)
+            for (reservation_id, name, table_num, start, end), entry in zip(rows, found) if entry is None
+            }
+        if fresh:
+            meals, comments = self._extras(connection, list(fresh))
+            for reservation_id, meal in meals.items():
+                entry = fresh[reservation_id]
+                for dish in meal:
+                    entry.add_order(dish)
+            for reservation_id, reservation_comments in comments.items():
+                entry = fresh[reservation_id]
+                for comment in reservation_comments:
+                    entry.add_comment(comment)
+        # another lookup may have handed out the same reservation meanwhile
+        return [entry if entry is not None else self._live.setdefault(row[0], fresh[row[0]]) for row, entry in zip(rows, found)]
+
+    def _archived(self, where:str, *params, order:str = "id", limit:int = -1) -> list[ArchivedRecord]:
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                f"SELECT {RESERVATION_COLUMNS} FROM archived_reservations WHERE restaurant = ? AND {where} ORDER BY {order} LIMIT ?",
+                (self.restaurant_name, *params, limit),
+                ).fetchall()
+            meals, comments = self._extras(connection, [row[0] for row in rows])
+        return [
+            (reservation_id, name, table_num, from_minutes(start), (end - start) * MINUTE, tuple(meals.get(reservation_id, ())), tuple(comments.get(reservation_id, ())))
+            for reservation_id, name, table_num, start, end in rows
+            ]
+
+    def get(self, reservation_id:int) -> Reservation | None:
+        found = self._select("id = ?", reservation_id)
+        return found[0] if found else None
+
+    def max_id(self) -> int:
+        with self.pool.connection() as connection:
+            return max(
+                connection.execute(f"SELECT MAX(id) FROM {table} WHERE restaurant = ?", (self.restaurant_name,)).fetchone()[0] or 0
+                for table in ("reservations", "archived_reservations")
+                )
+
+    def all(self) -> list[Reservation]:
+        return self._select("1")
+
+    def by_table(self, table_num:int) -> list[Reservation]:
+        return self._select("table_num = ?", table_num)
+
+    def by_start(self, start:datetime) -> list[Reservation]:
+        return self._select("start_minute = ?", to_minutes(start))
+
+    def by_name(self, name:str) -> list[Reservation]:
+        return self._select("name = ?", name)
+
+    def by_day(self, day:date) -> list[Reservation]:
+        day_start = to_minutes(datetime.combine(day, time()))
+        return self._select("start_minute >= ? AND start_minute < ?", day_start, day_start + MINUTES_IN_DAY)
+
+    def first_day(self, after:date) -> date | None:
+        with self.pool.connection() as connection:
+            first, = connection.execute(
+                "SELECT MIN(start_minute) FROM reservations WHERE restaurant = ? AND start_minute >= ?",
+                (self.restaurant_name, to_minutes(datetime.combine(after, time()))),
+                ).fetchone()
+        return None if first is None else from_minutes(first).date()
+
+    def finished_by(self, now:datetime) -> list[Reservation]:
+        return self._select("start_minute < ? AND end_minute <= ?", to_minutes(now), to_minutes(now))
+
+    def overlapping(self, start:datetime, end:datetime) -> list[Reservation]:
+        start_minute, end_minute = to_minutes(start), to_minutes(end)
+        return self._select(
+            "start_minute >= ? AND start_minute < ? AND end_minute > ?",
+            start_minute - self._longest, end_minute, start_minute,
+            )
+
+    def count_by_table(self) -> dict[int, int]:
+        with self.pool.connection() as connection:
+            return dict(connection.execute(
+                "SELECT table_num, COUNT(*) FROM reservations WHERE restaurant = ? GROUP BY table_num",
+                (self.restaurant_name,),
+                ))
+
+    def is_table_free(self, table_num:int, start:datetime, end:datetime) -> bool:
+        # the table's last reservation starting before `end` has the latest end of all of them
+        with self.pool.connection() as connection:
+            row = connection.execute(
+                "SELECT end_minute FROM reservations WHERE restaurant = ? AND table_num = ? AND start_minute < ? "
+                "ORDER BY start_minute DESC LIMIT 1",
+                (self.restaurant_name, table_num, to_minutes(end)),
+                ).fetchone()
+        return row is None or row[0] <= to_minutes(start)
+
+    def timeline(self, table_num:int, after:datetime, before:datetime) -> list[tuple[datetime, datetime, int]]:
+        after_minute = to_minutes(after)
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT start_minute, end_minute, id FROM reservations WHERE restaurant = ? AND table_num = ? "
+                "AND start_minute >= ? AND start_minute < ? AND end_minute > ? ORDER BY start_minute",
+                (self.restaurant_name, table_num, after_minute - self._longest, to_minutes(before), after_minute),
+                ).fetchall()
+        return [(from_minutes(start), from_minutes(end), reservation_id) for start, end, reservation_id in rows]
+
+    def _order_fields(self, dish:Dish | OrderLine) -> tuple:
+        code = PLAIN_ORDER
+        if isinstance(dish, OrderLine):
+            dish, code = dish.dish, dish.code
+        return (dish.section, dish.id, dish.name, dish.base_price, dish.description, code)
+
+    def add_order(self, entry:Reservation, dish:Dish | OrderLine) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute(
+                "INSERT INTO orders (restaurant, reservation_id, section, dish_id, name, price, description, code) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.restaurant_name, entry.id, *self._order_fields(dish)),
+                )
+        entry.add_order(dish)
+
+    def add_comment(self, entry:Reservation, comment:str) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute("INSERT INTO comments (restaurant, reservation_id, comment) VALUES (?, ?, ?)", (self.restaurant_name, entry.id, comment))
+        entry.add_comment(comment)
+
+    def archive(self, entries:list[Reservation]) -> None:
+        rows = [(self.restaurant_name, entry.id) for entry in entries]
+        for entry in entries:
+            self._live.pop(entry.id, None)
+        with self.pool.transaction() as connection:
+            connection.executemany(
+                f"INSERT INTO archived_reservations (restaurant, {RESERVATION_COLUMNS}) "
+                f"SELECT restaurant, {RESERVATION_COLUMNS} FROM reservations WHERE restaurant = ? AND id = ?",
+                rows,
+                )
+            connection.executemany("DELETE FROM reservations WHERE restaurant = ? AND id = ?", rows)
+
+    def add_archived(self, records:list[ArchivedRecord]) -> None:
+        self._insert("archived_reservations", records)
+
+    def get_archived(self, reservation_id:int) -> ArchivedRecord | None:
+        found = self._archived("id = ?", reservation_id)
+        return found[0] if found else None
+
+    def archived_by_name(self, name:str) -> list[ArchivedRecord]:
+        return self._archived("name = ?", name)
+
+    def iter_archived(self, after:datetime | None = None, before:datetime | None = None) -> Iterator[ArchivedRecord]:
+        # a page at a time by (start, id), no connection is held between pages
+        low = to_minutes(after) if after is not None else -2 ** 63
+        high = to_minutes(before) if before is not None else 2 ** 63 - 1
+        last_start, last_id = low, -2 ** 63
+        while True:
+            page = self._archived(
+                "start_minute < ? AND (start_minute, id) > (?, ?)",
+                high, last_start, last_id,
+                order = "start_minute, id",
+                limit = IN_CHUNK,
+                )
+            yield from page
+            if len(page) < IN_CHUNK:
+                return
+            last_start, last_id = to_minutes(page[-1][3]), page[-1][0]
+
+if __name__ == "__main__":
+    pass
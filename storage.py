@@ -0,0 +1,438 @@
+"""
+where a restaurant keeps its reservations, tables and dishes.
+
+the in memory engine is the default. reservations live in its stores
+and are looked up through them, tables and dishes always live in the
+Tables and Menu objects and their stores only write them through, so
+an engine backed by a file can load them back when it's opened again
+"""
+from __future__ import annotations
+import threading
+from abc import ABC, abstractmethod
+import weakref
+from collections.abc import Iterator
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING
+from reservation_archive import ReservationArchive, ArchivedRecord
+from reservation_columns import ReservationColumns
+from timeutil import EPOCH, MINUTE, to_minutes, from_minutes
+if TYPE_CHECKING:
+    from reservation import Reservation
+    from food_menu import Menu
+    from courses import Dish, OrderLine, DishDetails
+
+EPOCH_DAY = EPOCH.date()
+ONE_DAY = timedelta(days = 1)
+
+class ReservationStore(ABC):
+    """
+    the booked reservations of one restaurant. changes are made with the
+    Reservations lock held, but lookups aren't: the booking search calls
+    get, is_table_free and timeline without it and checks again under the
+    lock, and the plain lookups and exports read without it too. a store
+    has to answer reads safely while another thread writes
+    """
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, entry:Reservation) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_many(self, entries:list[Reservation]) -> None:
+        """
+        adds reservations that were booked before, in booking order
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove(self, entry:Reservation) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, reservation_id:int) -> Reservation | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def max_id(self) -> int:
+        """
+        the highest id stored, archived reservations included
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def all(self) -> list[Reservation]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def by_table(self, table_num:int) -> list[Reservation]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def by_start(self, start:datetime) -> list[Reservation]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def by_name(self, name:str) -> list[Reservation]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def by_day(self, day:date) -> list[Reservation]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def first_day(self, after:date) -> date | None:
+        """
+        the first day on or after `after` that a reservation starts on
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def finished_by(self, now:datetime) -> list[Reservation]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def overlapping(self, start:datetime, end:datetime) -> list[Reservation]:
+        """
+        the reservations overlapping [start, end) in booking order
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_by_table(self) -> dict[int, int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_table_free(self, table_num:int, start:datetime, end:datetime) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def timeline(self, table_num:int, after:datetime, before:datetime) -> list[tuple[datetime, datetime, int]]:
+        """
+        (start, end, id) of the table's reservations overlapping [after, before), sorted by start
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_order(self, entry:Reservation, dish:Dish | OrderLine) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_comment(self, entry:Reservation, comment:str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def archive(self, entries:list[Reservation]) -> None:
+        """
+        moves reservations that are over out of the booked ones,
+        their orders and comments are kept with them
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_archived(self, records:list[ArchivedRecord]) -> None:
+        """
+        puts back reservations that were archived before
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_archived(self, reservation_id:int) -> ArchivedRecord | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def archived_by_name(self, name:str) -> list[ArchivedRecord]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_archived(self, after:datetime | None = None, before:datetime | None = None) -> Iterator[ArchivedRecord]:
+        """
+        the archived reservations starting in [after, before), a few at a time
+        """
+        raise NotImplementedError
+
+class MemoryReservationStore(ReservationStore):
+    """
+    keeps the reservations as ReservationColumns and builds Reservation
+    objects only when they're looked up. a reservation that is still held
+    somewhere is handed out again, its orders and comments are the lists
+    the store keeps, so orders and comments go through the store
+    """
+    def __init__(self) -> None:
+        self.columns = ReservationColumns()
+        # most reservations never order or comment, only the ones that do are kept
+        self._meals:dict[int, list] = {}
+        self._comments:dict[int, list[str]] = {}
+        self._live:weakref.WeakValueDictionary[int, Reservation] = weakref.WeakValueDictionary()
+        # lookups run without the Reservations lock while a booking may move rows
+        self._lock = threading.Lock()
+        self._last_span:tuple = (None, None, 0, 0)
+        self.archived = ReservationArchive()
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def _keep(self, entry:Reservation) -> None:
+        if entry._meal:
+            self._meals[entry.id] = entry._meal
+        if entry._comments:
+            self._comments[entry.id] = entry._comments
+        self._live[entry.id] = entry
+
+    def add(self, entry:Reservation) -> None:
+        with self._lock:
+            self.columns.append(entry.id, entry.table_num, to_minutes(entry.start), to_minutes(entry.end), entry.name)
+            self._keep(entry)
+
+    def add_many(self, entries:list[Reservation]) -> None:
+        rows = []
+        for entry in entries:
+            start = to_minutes(entry.start)
+            rows.append((entry.id, entry.table_num, start, start + entry.duration // MINUTE, entry.name))
+        with self._lock:
+            self.columns.extend(rows)
+            for entry in entries:
+                self._keep(entry)
+
+    def remove(self, entry:Reservation) -> None:
+        with self._lock:
+            self.columns.remove(entry.id)
+            self._meals.pop(entry.id, None)
+            self._comments.pop(entry.id, None)
+            self._live.pop(entry.id, None)
+
+    def _build(self, reservation_id:int) -> Reservation:
+        # reservation imports this module
+        from reservation import Reservation
+        entry = self._live.get(reservation_id)
+        if entry is not None:
+            return entry
+        table_num, start, end, name = self.columns.row(reservation_id)
+        entry = Reservation(reservation_id, name, table_num, from_minutes(start), (end - start) * MINUTE)
+        meal = self._meals.get(reservation_id)
+        if meal:
+            for dish in meal:
+                entry.add_order(dish)
+            # the object's list is the one kept from now on
+            self._meals[reservation_id] = entry._meal
+        entry._comments = self._comments.get(reservation_id)
+        self._live[reservation_id] = entry
+        return entry
+
+    def _build_all(self, ids:list[int]) -> list[Reservation]:
+        return [self._build(reservation_id) for reservation_id in ids]
+
+    def get(self, reservation_id:int) -> Reservation | None:
+        with self._lock:
+            return self._build(reservation_id) if reservation_id in self.columns else None
+
+    def max_id(self) -> int:
+        return max(max(self.columns.ids, default = 0), max(self.archived.ids, default = 0))
+
+    def all(self) -> list[Reservation]:
+        with self._lock:
+            return self._build_all(list(self.columns.rows))
+
+    def by_table(self, table_num:int) -> list[Reservation]:
+        with self._lock:
+            return self._build_all(self.columns.by_table(table_num))
+
+    def by_start(self, start:datetime) -> list[Reservation]:
+        with self._lock:
+            return self._build_all(self.columns.by_start(to_minutes(start)))
+
+    def by_name(self, name:str) -> list[Reservation]:
+        with self._lock:
+            return self._build_all(self.columns.by_name(name))
+
+    def by_day(self, day:date) -> list[Reservation]:
+        with self._lock:
+            return self._build_all(self.columns.by_day((day - EPOCH_DAY).days))
+
+    def first_day(self, after:date) -> date | None:
+        with self._lock:
+            day = self.columns.first_day((after - EPOCH_DAY).days)
+        return None if day is None else EPOCH_DAY + day * ONE_DAY
+
+    def finished_by(self, now:datetime) -> list[Reservation]:
+        with self._lock:
+            return self._build_all(self.columns.finished_by(to_minutes(now)))
+
+    def overlapping(self, start:datetime, end:datetime) -> list[Reservation]:
+        with self._lock:
+            return self._build_all(self.columns.overlapping(to_minutes(start), to_minutes(end)))
+
+    def count_by_table(self) -> dict[int, int]:
+        with self._lock:
+            return self.columns.count_by_table()
+
+    def _span(self, start:datetime, end:datetime) -> tuple[int, int]:
+        # the booking search asks about the same times table after table
+        span = self._last_span
+        if span[0] != start or span[1] != end:
+            span = self._last_span = (start, end, to_minutes(start), to_minutes(end))
+        return span[2], span[3]
+
+    def is_table_free(self, table_num:int, start:datetime, end:datetime) -> bool:
+        start_minute, end_minute = self._span(start, end)
+        with self._lock:
+            return self.columns.is_free(table_num, start_minute, end_minute)
+
+    def timeline(self, table_num:int, after:datetime, before:datetime) -> list[tuple[datetime, datetime, int]]:
+        with self._lock:
+            timeline = self.columns.timeline(table_num, to_minutes(after), to_minutes(before))
+        return [(from_minutes(start), from_minutes(end), reservation_id) for start, end, reservation_id in timeline]
+
+    def add_order(self, entry:Reservation, dish:Dish | OrderLine) -> None:
+        entry.add_order(dish)
+        self._meals[entry.id] = entry._meal
+
+    def add_comment(self, entry:Reservation, comment:str) -> None:
+        entry.add_comment(comment)
+        self._comments[entry.id] = entry._comments
+
+    def archive(self, entries:list[Reservation]) -> None:
+        for entry in entries:
+            self.remove(entry)
+            self.archived.add(entry.id, entry.name, entry.table_num, entry.start, entry.duration, entry._meal, entry._comments)
+
+    def add_archived(self, records:list[ArchivedRecord]) -> None:
+        for record in records:
+            self.archived.add(*record)
+
+    def get_archived(self, reservation_id:int) -> ArchivedRecord | None:
+        return self.archived.get(reservation_id)
+
+    def archived_by_name(self, name:str) -> list[ArchivedRecord]:
+        return self.archived.get_by_name(name)
+
+    def iter_archived(self, after:datetime | None = None, before:datetime | None = None) -> Iterator[ArchivedRecord]:
+        return self.archived.iter_records(after, before)
+
+class TableStore(ABC):
+    """
+    writes a restaurant's tables through, the Tables object keeps them as well
+    """
+    @abstractmethod
+    def load(self) -> list[tuple[int, int]]:
+        """
+        Returns:
+            list[tuple[int, int]]: (number, sits) of the stored tables in the order they were added
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_table(self, number:int, sits:int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_table(self, number:int) -> None:
+        raise NotImplementedError
+
+class MemoryTableStore(TableStore):
+    """
+    the Tables object is all there is, nothing to write
+    """
+    def load(self) -> list[tuple[int, int]]:
+        return []
+
+    def save_table(self, number:int, sits:int) -> None:
+        pass
+
+    def delete_table(self, number:int) -> None:
+        pass
+
+# (section, dish id, name, price, description, bread quantity or None)
+DishRow = tuple[str, int, str, float, str, int | None]
+
+class MenuStore(ABC):
+    """
+    writes a restaurant's dishes and bread stock through, the Menu keeps them as well
+    """
+    @abstractmethod
+    def load(self) -> list[DishRow]:
+        """
+        Returns:
+            list[DishRow]: the stored dishes by id
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_dish(self, section:str, dish_id:int, details:DishDetails, quantity:int | None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_dish(self, section:str, name:str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_stock(self, name:str, quantity:int) -> None:
+        raise NotImplementedError
+
+class MemoryMenuStore(MenuStore):
+    """
+    the Menu object is all there is, nothing to write
+    """
+    def load(self) -> list[DishRow]:
+        return []
+
+    def save_dish(self, section:str, dish_id:int, details:DishDetails, quantity:int | None) -> None:
+        pass
+
+    def delete_dish(self, section:str, name:str) -> None:
+        pass
+
+    def save_stock(self, name:str, quantity:int) -> None:
+        pass
+
+class Storage(ABC):
+    """
+    a storage engine, hands every restaurant its stores
+    """
+    @abstractmethod
+    def restaurant_names(self) -> list[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_restaurant(self, name:str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_restaurant(self, name:str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def reservation_store(self, restaurant_name:str, menu:Menu) -> ReservationStore:
+        raise NotImplementedError
+
+    @abstractmethod
+    def table_store(self, restaurant_name:str) -> TableStore:
+        raise NotImplementedError
+
+    @abstractmethod
+    def menu_store(self, restaurant_name:str) -> MenuStore:
+        raise NotImplementedError
+
+class MemoryStorage(Storage):
+    def restaurant_names(self) -> list[str]:
+        return []
+
+    def save_restaurant(self, name:str) -> None:
+        pass
+
+    def delete_restaurant(self, name:str) -> None:
+        pass
+
+    def reservation_store(self, restaurant_name:str, menu:Menu) -> ReservationStore:
+        return MemoryReservationStore()
+
+    def table_store(self, restaurant_name:str) -> TableStore:
+        return MemoryTableStore()
+
+    def menu_store(self, restaurant_name:str) -> MenuStore:
+        return MemoryMenuStore()
+
+if __name__ == "__main__":
+    pass
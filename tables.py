@@ -1,5 +1,11 @@
+from bisect import bisect_left, insort
+from typing import TYPE_CHECKING
 import exceptions
+from storage import TableStore, MemoryTableStore
+if TYPE_CHECKING:
+    from journal import RestaurantJournal
 class Table:
+    __slots__ = ("number", "sits")
     def __init__(self, number:int, sits:int) -> None:
         self.number = number
         self.sits = sits
@@ -8,27 +14,55 @@ class Table:
         return f"table number {self.number}, {self.sits} sits\n"
 
 class Tables:
-    def __init__(self) -> None:
-        self.collection:list[Table] = []
+    def __init__(self, best_fit:bool = False, store:TableStore | None = None) -> None:
+        self.collection:dict[int, Table] = {}
+        # best fit hands out the smallest fitting table first instead of the first one added
+        self.best_fit = best_fit
+        self._added = 0
+        # (sits, insertion order, number) kept sorted so a bisect finds every table big enough
+        self._by_sits:list[tuple[int, int, int]] = []
+        self._sits_keys:dict[int, tuple[int, int, int]] = {}
+        self.journal:RestaurantJournal | None = None
+        self.store = store or MemoryTableStore()
+        for number, sits in self.store.load():
+            self._add(number, sits)
+
+    def _add(self, number:int, sits:int) -> None:
+        self.collection[number] = Table(number, sits)
+        key = (sits, self._added, number)
+        self._added += 1
+        self._sits_keys[number] = key
+        insort(self._by_sits, key)
 
     def add_table(self, number:int, sits:int):
-        if number not in [table.number for table in self.collection]:
-            self.collection.append(Table(number, sits))
+        if number not in self.collection:
+            self._add(number, sits)
+            self.store.save_table(number, sits)
+            if self.journal:
+                self.journal.record("add_table", number = number, sits = sits)
         else:
             raise exceptions.TableNumberAlreadyExistError
     
     def remove_table_by_number(self, table_num):
-            table = self.get_table_by_number(table_num)
-            self.collection.remove(table)
+            self.get_table_by_number(table_num)
+            del self.collection[table_num]
+            key = self._sits_keys.pop(table_num)
+            self._by_sits.pop(bisect_left(self._by_sits, key))
+            self.store.delete_table(table_num)
+            if self.journal:
+                self.journal.record("remove_table", number = table_num)
 
     def __str__(self) -> str:
-        return "".join([str(table) for table in self.collection])
+        return "".join([str(table) for table in self.collection.values()])
     
     def get_table_by_sits(self, sits:int) -> list[Table]:
-        return [t for t in self.collection if t.sits >= sits]
+        fitting = self._by_sits[bisect_left(self._by_sits, (sits,)):]
+        if not self.best_fit:
+            fitting.sort(key = lambda key: key[1])
+        return [self.collection[number] for _, _, number in fitting]
     
     def get_table_by_number(self,table_num) -> Table:
         try:
-            return next(t for t in self.collection if t.number == table_num)
-        except StopIteration:
-            raise exceptions.TableNotExistError
\ No newline at end of file
+            return self.collection[table_num]
+        except KeyError:
+            raise exceptions.TableNotExistError
@@ -0,0 +1,58 @@
+"""
+bread stock sold and reserved from several terminals at once
+"""
+import sys
+import threading
+import pytest
+import exceptions
+from courses import BreadMenu, DishDetails
+
+@pytest.fixture
+def busy_switching():
+    # switching threads this often makes a lost update show with a small stock
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(switch_interval)
+
+def test_no_loaf_is_sold_twice(busy_switching):
+    stock, threads = 3000, 4
+    breads = BreadMenu()
+    pita = breads.add_bread(DishDetails("pita", 3, "fresh"), stock)
+    sold = [0] * threads
+    lowest = [stock]
+    def terminal(index:int) -> None:
+        while True:
+            try:
+                if index % 2:
+                    breads.sell_bread(pita)
+                    sold[index] += 1
+                else:
+                    breads.reserve("pita", 3)
+                    breads.release("pita", 1)
+                    sold[index] += 2
+            except exceptions.NotEnoughBreadError:
+                return
+            lowest[0] = min(lowest[0], pita.quantity)
+    workers = [threading.Thread(target = terminal, args = (i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert pita.quantity >= 0 and lowest[0] >= 0
+    assert sum(sold) + pita.quantity == stock
+    # a reserve of 3 can't be served with fewer left
+    assert pita.quantity < 3
+
+def test_reserve_is_all_or_nothing():
+    breads = BreadMenu()
+    pita = breads.add_bread(DishDetails("pita", 3, "fresh"), 2)
+    with pytest.raises(exceptions.NotEnoughBreadError):
+        breads.reserve("pita", 3)
+    assert pita.quantity == 2
+    breads.reserve("pita", 2)
+    breads.release("pita", 2)
+    assert pita.quantity == 2
+
+if __name__ == "__main__":
+    pass
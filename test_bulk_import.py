@@ -0,0 +1,98 @@
+"""
+bulk imports from csv, jsonl and json, which rows are added and which
+are reported with their lines
+"""
+import json
+import pytest
+import rest
+import exceptions
+import bulk_import
+
+@pytest.fixture
+def restaurants() -> rest.Restaurants:
+    restaurants = rest.Restaurants()
+    restaurants.add_restaurant("luigi")
+    restaurants.add_restaurant("mario")
+    return restaurants
+
+def _write(tmp_path, name:str, text:str) -> str:
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def _menu(restaurants:rest.Restaurants, name:str = "luigi"):
+    return restaurants.get_restaurant_by_name(name).menu
+
+def _errors(report:bulk_import.ImportReport) -> list[tuple[int, str]]:
+    return [(error.line, error.message) for error in report.errors]
+
+def test_csv(restaurants, tmp_path):
+    path = _write(tmp_path, "dishes.csv", "\n".join([
+        "section,name,price,description,quantity,restaurant",
+        "first_course, Soup ,10,hot,,",
+        "drink,tea,-1,,,",
+        "bread,pita,3,,5,mario",
+        "bread,naan,3,,,",
+        "pasta,carbonara,12,,,",
+        "drink,cola,4,,,nobody",
+        ]))
+    report = bulk_import.import_dishes(restaurants, path, "luigi")
+    assert (report.loaded, report.failed, report.ok) == (2, 4, False)
+    assert [line for line, _ in _errors(report)] == [3, 5, 6, 7]
+    assert _errors(report)[0][1].startswith("price")
+    assert _errors(report)[1][1] == "bread requires quantity"
+    assert _menu(restaurants).get_dish_by_name("first_course", "soup").price == 10
+    assert _menu(restaurants, "mario").get_dish_by_name("bread", "pita").quantity == 5
+
+def test_jsonl(restaurants, tmp_path):
+    path = _write(tmp_path, "tables.jsonl", "\n".join([
+        json.dumps({"number" : 1, "sits" : 4}),
+        "",
+        "{not json",
+        json.dumps({"number" : 2, "sits" : 0}),
+        json.dumps({"number" : 1, "sits" : 2}),
+        json.dumps({"number" : 3, "sits" : 2, "restaurant" : "mario"}),
+        ]))
+    report = bulk_import.import_tables(restaurants, path, "luigi")
+    assert (report.loaded, report.failed) == (2, 3)
+    assert [line for line, _ in _errors(report)] == [3, 4, 5]
+    assert _errors(report)[2][1] == "TableNumberAlreadyExistError"
+    assert list(restaurants.get_restaurant_by_name("luigi").tables.collection) == [1]
+    assert list(restaurants.get_restaurant_by_name("mario").tables.collection) == [3]
+
+def test_json_array(restaurants, tmp_path):
+    rows = [{"section" : "drink", "name" : f"drink {i}", "price" : 1 + i} for i in range(5)]
+    rows[2]["price"] = "free"
+    path = _write(tmp_path, "dishes.json", "[\n" + ",\n".join(json.dumps(row) for row in rows) + "\n]\n")
+    # a batch of two puts the bad row in a batch of its own good row
+    report = bulk_import.import_dishes(restaurants, path, "luigi", batch_size = 2)
+    assert (report.loaded, report.failed) == (4, 1)
+    assert [line for line, _ in _errors(report)] == [4]
+    assert _menu(restaurants).get_dish_by_name("drink", "drink 4").price == 5
+
+@pytest.mark.parametrize("tail, message", [
+        ('{"section": oops}, {"section" : "drink", "name" : "late", "price" : 1}]', "broken json, the rows after it weren't read: Expecting value"),
+        ("", "the json array isn't closed"),
+        ])
+def test_broken_json_keeps_the_rows_before_it(restaurants, tmp_path, tail, message):
+    rows = ",\n".join(json.dumps({"section" : "drink", "name" : f"drink {i}", "price" : 1}) for i in range(3))
+    path = _write(tmp_path, "dishes.json", f"[\n{rows},\n{tail}")
+    report = bulk_import.import_dishes(restaurants, path, "luigi")
+    assert report.loaded == 3
+    assert _errors(report) == [(5, message)]
+    with pytest.raises(exceptions.DishNotExistError):
+        _menu(restaurants).get_dish_by_name("drink", "late")
+
+def test_errors_past_the_limit_are_counted(restaurants, tmp_path):
+    path = _write(tmp_path, "tables.csv", "number,sits\n" + "\n".join(f"{i},0" for i in range(1, 11)))
+    report = bulk_import.import_tables(restaurants, path, "luigi", max_errors = 3)
+    assert (report.loaded, report.failed, len(report.errors)) == (0, 10, 3)
+
+def test_not_an_array_or_unknown_extension(restaurants, tmp_path):
+    with pytest.raises(ValueError):
+        bulk_import.import_dishes(restaurants, _write(tmp_path, "dishes.json", '{"section" : "drink"}'), "luigi")
+    with pytest.raises(ValueError):
+        bulk_import.import_dishes(restaurants, _write(tmp_path, "dishes.xml", "<dishes/>"), "luigi")
+
+if __name__ == "__main__":
+    pass
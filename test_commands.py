@@ -0,0 +1,77 @@
+"""
+the headless command mode, one json line in and one result out
+"""
+import json
+import pytest
+import rest
+from commands import run_command
+
+@pytest.fixture
+def restaurants() -> rest.Restaurants:
+    restaurants = rest.Restaurants()
+    for line in (
+            {"cmd" : "add_restaurant", "name" : "luigi"},
+            {"cmd" : "add_table", "restaurant" : "luigi", "number" : 1, "sits" : 4},
+            {"cmd" : "add_dish", "restaurant" : "luigi", "section" : "bread", "name" : "pita", "price" : 3, "quantity" : 2},
+            {"cmd" : "add_dish", "restaurant" : "luigi", "section" : "desert", "name" : "cake", "price" : 8},
+            ):
+        assert _run(restaurants, line)["ok"]
+    return restaurants
+
+def _run(restaurants:rest.Restaurants, command:dict) -> dict:
+    return run_command(restaurants, json.dumps(command))
+
+def _book(restaurants:rest.Restaurants, start:str, **extra) -> dict:
+    command = {"cmd" : "new_reservation", "restaurant" : "luigi", "name" : "dana", "sits" : 2, "start" : start, "duration" : 90}
+    return _run(restaurants, {**command, **extra})
+
+def _reservations(restaurants:rest.Restaurants):
+    return restaurants.get_restaurant_by_name("luigi").reservations
+
+def test_booking_and_ref(restaurants):
+    response = _book(restaurants, "2026-01-01T19:00", ref = "a1")
+    assert response["ok"] and response["ref"] == "a1"
+    assert response["result"]["table"] == 1
+    assert response["result"]["end"] == "2026-01-01T20:30:00"
+
+def test_unknown_command_and_missing_argument(restaurants):
+    assert _run(restaurants, {"cmd" : "dance", "ref" : 7}) == {"ok" : False, "error" : "UnknownCommand", "message" : "unknown command 'dance'", "ref" : 7}
+    assert _run(restaurants, {"cmd" : "new_reservation", "restaurant" : "luigi"})["error"] == "MissingArgument"
+    assert run_command(restaurants, "[1, 2]")["ok"] is False
+    assert run_command(restaurants, "{not json")["ok"] is False
+
+@pytest.mark.parametrize("start", ["2026-01-01T19:00+02:00", "2026-01-01T19:00Z", "2026-01-01T19:00:30"])
+def test_start_has_to_be_a_local_whole_minute(restaurants, start):
+    response = _book(restaurants, start)
+    assert response["error"] == "ValueError"
+    # nothing was booked, the table still takes a booking at the same time
+    assert len(_reservations(restaurants)) == 0
+    assert _book(restaurants, "2026-01-01T19:00")["ok"]
+
+def test_short_bookings_are_rejected(restaurants):
+    for duration in (5, 0, -120):
+        assert _book(restaurants, "2026-01-01T19:00", duration = duration)["error"] == "ValueError"
+    assert len(_reservations(restaurants)) == 0
+
+@pytest.mark.parametrize("start, duration", [("2026-01-01T19:00", 1e300), ("9999-12-31T23:00", 90)])
+def test_overflows_are_reported(restaurants, start, duration):
+    assert _book(restaurants, start, duration = duration)["error"] == "OverflowError"
+    assert _book(restaurants, "2026-01-01T19:00")["ok"]
+
+def test_flags_have_to_be_json_bools(restaurants):
+    reservation_id = _book(restaurants, "2026-01-01T19:00")["result"]["id"]
+    order = {"cmd" : "order_dish", "restaurant" : "luigi", "id" : reservation_id, "section" : "desert", "name" : "cake"}
+    assert _run(restaurants, {**order, "with_sugar" : "false"})["error"] == "TypeError"
+    assert _run(restaurants, {**order, "with_sugar" : False})["result"] == {"name" : "cake", "price" : pytest.approx(8.8)}
+
+def test_bread_is_only_sold_to_a_reservation(restaurants):
+    order = {"cmd" : "order_dish", "restaurant" : "luigi", "id" : 99, "section" : "bread", "name" : "pita"}
+    assert _run(restaurants, order)["error"] == "ReservationNotFoundError"
+    bread = restaurants.get_restaurant_by_name("luigi").menu.bread
+    assert bread.get_bread_by_name("pita").quantity == 2
+    order["id"] = _book(restaurants, "2026-01-01T19:00")["result"]["id"]
+    assert _run(restaurants, order)["ok"]
+    assert bread.get_bread_by_name("pita").quantity == 1
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,64 @@
+"""
+terminals booking and cancelling in the same restaurant at once, on both storage engines
+"""
+import random
+import sys
+import threading
+from datetime import datetime, timedelta
+import pytest
+import rest
+import exceptions
+from reservation import ReservationDetails
+from storage import MemoryStorage
+from sqlite_storage import SqliteStorage
+
+FIRST = datetime(2026, 1, 1, 12)
+
+@pytest.fixture(params = ["memory", "sqlite"])
+def restaurant(request, tmp_path):
+    engine = MemoryStorage() if request.param == "memory" else SqliteStorage(str(tmp_path / "restaurants.db"))
+    restaurants = rest.Restaurants(engine)
+    restaurants.add_restaurant("luigi")
+    restaurant = restaurants.get_restaurant_by_name("luigi")
+    for number in range(1, 11):
+        restaurant.tables.add_table(number, 2 + number % 7)
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield restaurant
+    sys.setswitchinterval(switch_interval)
+    if request.param == "sqlite":
+        engine.close()
+
+def test_no_table_is_double_booked(restaurant):
+    threads, bookings = 4, 300
+    kept:list[list[int]] = [[] for _ in range(threads)]
+    def terminal(index:int) -> None:
+        rng = random.Random(index)
+        mine = kept[index]
+        for _ in range(bookings):
+            if mine and rng.random() < 0.1:
+                restaurant.reservations.cancel_reservation(mine.pop(rng.randrange(len(mine))))
+                continue
+            # few start times so the terminals keep going for the same tables
+            start = FIRST + timedelta(minutes = 15 * rng.randrange(100))
+            details = ReservationDetails(f"terminal {index}", rng.randint(1, 8), start, timedelta(minutes = rng.choice([60, 90, 120])))
+            try:
+                mine.append(restaurant.reservations.new_reservation(details).id)
+            except exceptions.NoAvailableTablesError:
+                pass
+    workers = [threading.Thread(target = terminal, args = (i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    reservations = restaurant.reservations
+    ids = [r.id for r in reservations.get_all_reservations()]
+    assert sorted(ids) == sorted(i for mine in kept for i in mine)
+    assert len(ids) == len(set(ids))
+    for table_num in restaurant.tables.collection:
+        booked = sorted(reservations.get_reservations_by_table(table_num), key = lambda r: r.start)
+        for before, after in zip(booked, booked[1:]):
+            assert before.end <= after.start, f"table {table_num} is double booked"
+
+if __name__ == "__main__":
+    pass
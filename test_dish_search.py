@@ -0,0 +1,42 @@
+"""
+the dish search index, prefixes, misspellings and names that only differ in case
+"""
+import dish_search
+from dish_search import DishSearchIndex
+
+def _index(*names:str, section:str = "main_course") -> DishSearchIndex:
+    index = DishSearchIndex()
+    for name in names:
+        index.add(name, section)
+    return index
+
+def test_prefixes_come_before_later_words():
+    index = _index("beef stew", "spicy beef", "beet salad", "roast chicken")
+    assert index.search("bee") == [("main_course", "beef stew"), ("main_course", "beet salad"), ("main_course", "spicy beef")]
+    assert index.search("bee", limit = 1) == [("main_course", "beef stew")]
+    assert index.search("bee", section = "drink") == []
+
+def test_misspellings():
+    index = _index("chicken soup", "onion soup", "chicken wings", "grilled salmon")
+    assert index.search("chiken soup")[0] == ("main_course", "chicken soup")
+    assert index.search("grild salmon", limit = 1) == [("main_course", "grilled salmon")]
+    assert index.search("xyz") == []
+
+def test_misspellings_on_a_menu_past_the_postings_cap(monkeypatch):
+    monkeypatch.setattr(dish_search, "MAX_POSTINGS", 20)
+    index = _index(*(f"chicken dish {i}" for i in range(100)), "chicken soup", "onion soup")
+    assert index.search("chiken soup", limit = 2) == [("main_course", "chicken soup"), ("main_course", "onion soup")]
+
+def test_names_that_only_differ_in_case():
+    index = _index("Soup", "soup")
+    assert index.search("sou") == [("main_course", "Soup"), ("main_course", "soup")]
+    index.remove("Soup", "main_course")
+    assert index.search("sou") == [("main_course", "soup")]
+    assert index.search("sop") == [("main_course", "soup")]
+    index.remove("Soup", "main_course")
+    index.remove("soup", "main_course")
+    assert index.search("sou") == []
+    assert index.search("sop") == []
+
+if __name__ == "__main__":
+    pass
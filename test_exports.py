@@ -0,0 +1,87 @@
+"""
+the streaming exports, rows and cents as they're written out
+"""
+import csv
+import json
+import sys
+from datetime import datetime, timedelta
+import pytest
+import rest
+import exceptions
+import exports
+from commands import run_command
+from courses import DishDetails, ClientDesert
+from reservation import ReservationDetails
+
+NOON = datetime(2026, 1, 1, 12)
+HOUR = timedelta(hours = 1)
+
+@pytest.fixture
+def restaurants() -> rest.Restaurants:
+    restaurants = rest.Restaurants()
+    restaurants.add_restaurant("luigi")
+    restaurant = restaurants.get_restaurant_by_name("luigi")
+    restaurant.tables.add_table(1, 4)
+    menu = restaurant.menu
+    menu.add_dish(DishDetails("soup", 10, "hot"), "first_course", None)
+    menu.add_dish(DishDetails("cake", 8, "sweet"), "desert", None)
+    menu.add_dish(DishDetails("tea", 0.125, "a sip"), "drink", None)
+    reservations = restaurant.reservations
+    lunch = reservations.new_reservation(ReservationDetails("dana", 2, NOON, HOUR))
+    reservations.add_order(lunch.id, ClientDesert(menu.get_dish_by_name("desert", "cake"), False))
+    reservations.order_dish(lunch.id, "soup", "first_course")
+    dinner = reservations.new_reservation(ReservationDetails("noa", 2, NOON + 6 * HOUR, HOUR))
+    reservations.order_dish(dinner.id, "tea", "drink")
+    reservations.archive_finished(NOON + 2 * HOUR)
+    return restaurants
+
+def test_reservation_rows_and_cents(restaurants):
+    rows = list(exports.chain_rows(restaurants, "reservations"))
+    # the archived lunch first, then the dinner
+    assert rows == [
+        ("luigi", 1, "dana", 1, NOON, NOON + HOUR, 60, 2, 1880, 188, 372, 2440),
+        ("luigi", 2, "noa", 1, NOON + 6 * HOUR, NOON + 7 * HOUR, 60, 1, 13, 1, 3, 17),
+        ]
+    assert [row[1] for row in exports.reservation_rows(restaurants.collection[0], after = NOON + HOUR)] == [2]
+
+def test_order_line_rows(restaurants):
+    rows = list(exports.chain_rows(restaurants, "order_lines"))
+    assert [(row[1], row[3], row[6], row[7], row[8], row[9]) for row in rows] == [
+        (1, 1, "cake", "no sugar", 800, 880),
+        (1, 2, "soup", "", 1000, 1000),
+        (2, 1, "tea", "", 13, 13),
+        ]
+
+def test_csv_and_jsonl(restaurants, tmp_path):
+    csv_path = str(tmp_path / "reservations.csv")
+    assert exports.export(restaurants, "reservations", "csv", csv_path) == 2
+    with open(csv_path, newline = "") as written:
+        table = list(csv.DictReader(written))
+    assert [row["overall_cents"] for row in table] == ["2440", "17"]
+    assert table[0]["start"] == "2026-01-01T12:00:00"
+
+    jsonl_path = str(tmp_path / "order_lines.jsonl")
+    assert exports.export(restaurants, "order_lines", "jsonl", jsonl_path) == 3
+    with open(jsonl_path) as written:
+        lines = [json.loads(line) for line in written]
+    assert list(lines[0]) == list(exports.ORDER_LINE_FIELDS)
+    assert sum(line["price_cents"] for line in lines) == 1893
+
+def test_bad_kind_or_format(restaurants, tmp_path):
+    with pytest.raises(ValueError):
+        exports.export(restaurants, "tables", "csv", str(tmp_path / "x.csv"))
+    with pytest.raises(ValueError):
+        exports.export(restaurants, "reservations", "xlsx", str(tmp_path / "x.xlsx"))
+
+def test_parquet_without_pyarrow(restaurants, tmp_path, monkeypatch):
+    # a None entry makes the import fail as if pyarrow wasn't installed
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setitem(sys.modules, "pyarrow.parquet", None)
+    path = str(tmp_path / "reservations.parquet")
+    with pytest.raises(exceptions.ExportError):
+        exports.export(restaurants, "reservations", "parquet", path)
+    response = run_command(restaurants, json.dumps({"cmd" : "export", "kind" : "reservations", "format" : "parquet", "path" : path}))
+    assert (response["ok"], response["error"]) == (False, "ExportError")
+
+if __name__ == "__main__":
+    pass
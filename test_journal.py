@@ -0,0 +1,82 @@
+"""
+the journal, replaying it on top of the snapshot and checkpoints racing compactions
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+import journal
+import snapshot
+from reservation import ReservationDetails
+
+NOON = datetime(2026, 1, 1, 12)
+
+def _open(tmp_path, **options):
+    return journal.open_restaurants(str(tmp_path / "restaurants.snapshot"), str(tmp_path / "restaurants.journal"), **options)
+
+def _fill(restaurants) -> None:
+    restaurants.add_restaurant("luigi")
+    restaurant = restaurants.get_restaurant_by_name("luigi")
+    restaurant.tables.add_table(1, 4)
+    for hour in range(3):
+        restaurant.reservations.new_reservation(ReservationDetails("dana", 2, NOON + timedelta(hours = hour), timedelta(hours = 1)))
+
+def test_replay_after_a_compaction(tmp_path):
+    restaurants, log = _open(tmp_path)
+    _fill(restaurants)
+    log.compact().join()
+    restaurants.get_restaurant_by_name("luigi").tables.add_table(2, 2)
+    log.close()
+    restaurants, log = _open(tmp_path)
+    try:
+        restaurant = restaurants.get_restaurant_by_name("luigi")
+        assert sorted(restaurant.tables.collection) == [1, 2]
+        assert len(restaurant.reservations) == 3
+    finally:
+        log.close()
+
+def test_no_compaction_starts_during_a_checkpoint(tmp_path, monkeypatch):
+    restaurants, log = _open(tmp_path)
+    _fill(restaurants)
+    release = threading.Event()
+    fold = journal.fold
+    def held_fold(*args) -> None:
+        release.wait()
+        fold(*args)
+    monkeypatch.setattr(journal, "fold", held_fold)
+    running = log.compact()
+    checkpoint = threading.Thread(target = log.checkpoint, args = (restaurants,))
+    checkpoint.start()
+    while not log._checkpointing:
+        threading.Event().wait(0.001)
+    release.set()
+    running.join()
+    # the checkpoint is waiting for the lock or saving, it folds everything itself
+    assert log.compact() is None
+    checkpoint.join()
+    try:
+        assert os.path.getsize(log.path) == 0
+        assert not os.path.exists(f"{log.path}.compacting")
+        assert log.compact() is not None
+    finally:
+        log.close()
+    restaurants, log = _open(tmp_path)
+    try:
+        assert len(restaurants.get_restaurant_by_name("luigi").reservations) == 3
+    finally:
+        log.close()
+
+def test_saves_leave_no_temp_files(tmp_path):
+    restaurants, log = _open(tmp_path)
+    _fill(restaurants)
+    path = str(tmp_path / "other.snapshot")
+    saves = [threading.Thread(target = snapshot.save, args = (restaurants, path)) for _ in range(4)]
+    for save in saves:
+        save.start()
+    for save in saves:
+        save.join()
+    log.close()
+    assert sorted(os.listdir(tmp_path)) == ["other.snapshot", "restaurants.journal"]
+    assert len(snapshot.load(path).get_restaurant_by_name("luigi").reservations) == 3
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,51 @@
+"""
+the terminal menus, driven through input()
+"""
+from datetime import datetime, timedelta
+import pytest
+import rest
+from courses import DishDetails
+from reservation import ReservationDetails
+from menus import ManageExistingReservation
+
+@pytest.fixture
+def restaurant() -> rest.Restaurant:
+    restaurant = rest.Restaurant("luigi")
+    restaurant.tables.add_table(1, 4)
+    restaurant.menu.add_dish(DishDetails("pita", 3, "fresh"), "bread", 2)
+    return restaurant
+
+def _manage(restaurant:rest.Restaurant, monkeypatch, *typed:str) -> ManageExistingReservation:
+    answers = iter(typed)
+    monkeypatch.setattr("builtins.input", lambda prompt = "": next(answers))
+    reservations = restaurant.reservations
+    booked = reservations.new_reservation(ReservationDetails("dana", 2, datetime(2026, 1, 1, 12), timedelta(hours = 1)))
+    return ManageExistingReservation("add dishes to reservation", booked, reservations)
+
+def test_order_bread(restaurant, monkeypatch):
+    manage = _manage(restaurant, monkeypatch, "naan", "pita")
+    manage.order_bread()
+    assert restaurant.menu.bread.get_bread_by_name("pita").quantity == 1
+    assert manage.reservation.subtotal == 3
+
+def test_no_bread_is_sold_to_a_cancelled_reservation(restaurant, monkeypatch, capsys):
+    manage = _manage(restaurant, monkeypatch, "pita")
+    restaurant.reservations.cancel_reservation(manage.reservation.id)
+    manage.order_bread()
+    assert restaurant.menu.bread.get_bread_by_name("pita").quantity == 2
+    assert "wasn't ordered" in capsys.readouterr().out
+
+def test_bread_goes_back_when_the_order_fails(restaurant, monkeypatch):
+    manage = _manage(restaurant, monkeypatch, "pita")
+    reservations = restaurant.reservations
+    add_order = reservations.add_order
+    def cancelled_first(reservation_id, dish) -> None:
+        # cancelled by another terminal after the bread was taken
+        reservations.cancel_reservation(reservation_id)
+        add_order(reservation_id, dish)
+    monkeypatch.setattr(reservations, "add_order", cancelled_first)
+    manage.order_bread()
+    assert restaurant.menu.bread.get_bread_by_name("pita").quantity == 2
+
+if __name__ == "__main__":
+    pass
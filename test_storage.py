@@ -0,0 +1,130 @@
+"""
+the reservation stores of both storage engines, run through the restaurants
+the way the menus and the command mode use them
+"""
+from datetime import date, datetime, timedelta
+import pytest
+import rest
+import exceptions
+from courses import DishDetails
+from reservation import ReservationDetails
+from storage import MemoryStorage
+from sqlite_storage import SqliteStorage
+
+NOON = datetime(2026, 1, 1, 12)
+HOUR = timedelta(hours = 1)
+
+@pytest.fixture(params = ["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryStorage()
+        return
+    engine = SqliteStorage(str(tmp_path / "restaurants.db"))
+    yield engine
+    engine.close()
+
+def _restaurant(storage) -> rest.Restaurant:
+    restaurants = rest.Restaurants(storage)
+    restaurants.add_restaurant("luigi")
+    restaurant = restaurants.get_restaurant_by_name("luigi")
+    restaurant.tables.add_table(1, 2)
+    restaurant.tables.add_table(2, 4)
+    restaurant.menu.add_dish(DishDetails("soup", 10, "hot"), "first_course", None)
+    return restaurant
+
+def _book(restaurant:rest.Restaurant, name:str, sits:int, start:datetime, duration:timedelta = HOUR):
+    return restaurant.reservations.new_reservation(ReservationDetails(name, sits, start, duration))
+
+def test_booking_takes_a_free_table(storage):
+    restaurant = _restaurant(storage)
+    first = _book(restaurant, "dana", 2, NOON)
+    second = _book(restaurant, "noa", 2, NOON)
+    assert (first.table_num, second.table_num) == (1, 2)
+    assert second.id > first.id
+    with pytest.raises(exceptions.NoAvailableTablesError):
+        _book(restaurant, "gil", 2, NOON + HOUR / 2)
+    assert len(restaurant.reservations) == 2
+
+def test_cancel_frees_the_table(storage):
+    restaurant = _restaurant(storage)
+    booked = _book(restaurant, "dana", 4, NOON)
+    restaurant.reservations.cancel_reservation(booked.id)
+    with pytest.raises(exceptions.ReservationNotFoundError):
+        restaurant.reservations.get_reservation_by_id(booked.id)
+    with pytest.raises(exceptions.ReservationNotFoundError):
+        restaurant.reservations.cancel_reservation(booked.id)
+    assert _book(restaurant, "noa", 4, NOON).table_num == 2
+
+def test_lookups(storage):
+    restaurant = _restaurant(storage)
+    reservations = restaurant.reservations
+    dana = _book(restaurant, "dana", 2, NOON)
+    noa = _book(restaurant, "noa", 4, NOON + 3 * HOUR)
+    late = _book(restaurant, "dana", 2, NOON + timedelta(days = 1))
+    assert [r.id for r in reservations.get_reservations_by_name("dana")] == [dana.id, late.id]
+    assert [r.id for r in reservations.get_reservations_by_table(2)] == [noa.id]
+    assert [r.id for r in reservations.get_reservations_by_start(NOON)] == [dana.id]
+    assert [r.id for r in reservations.get_reservations_by_day(NOON.date())] == [dana.id, noa.id]
+    assert [r.id for r in reservations.get_reservations_between(NOON + HOUR / 2, NOON + 4 * HOUR)] == [dana.id, noa.id]
+    assert reservations.count_reservations_by_table() == {1 : 2, 2 : 1}
+
+def test_orders_show_on_a_held_reservation(storage):
+    restaurant = _restaurant(storage)
+    held = restaurant.reservations.get_reservation_by_id(_book(restaurant, "dana", 2, NOON).id)
+    restaurant.reservations.order_dish(held.id, "soup", "first_course")
+    restaurant.reservations.add_comment(held.id, "window")
+    assert held.subtotal == 10
+    assert list(held.comments) == ["window"]
+
+def test_archive_keeps_finished_reservations(storage):
+    restaurant = _restaurant(storage)
+    reservations = restaurant.reservations
+    done = _book(restaurant, "dana", 2, NOON)
+    reservations.order_dish(done.id, "soup", "first_course")
+    upcoming = _book(restaurant, "dana", 2, NOON + 2 * HOUR)
+    assert reservations.archive_finished(NOON + HOUR) == 1
+    assert [r.id for r in reservations.get_all_reservations()] == [upcoming.id]
+    archived = reservations.get_reservation_by_id(done.id)
+    assert archived.subtotal == 10
+    assert [r.id for r in reservations.get_reservations_by_name("dana")] == [done.id, upcoming.id]
+    assert [record[0] for record in reservations.iter_records()] == [done.id, upcoming.id]
+    with pytest.raises(exceptions.ReservationNotFoundError):
+        reservations.cancel_reservation(done.id)
+    # the archived reservation's table is free again
+    assert _book(restaurant, "noa", 2, NOON).table_num == 1
+
+def test_first_day(storage):
+    restaurant = _restaurant(storage)
+    store = restaurant.reservations.store
+    assert store.first_day(date.min) is None
+    day = NOON.date()
+    _book(restaurant, "dana", 2, NOON + timedelta(days = 3))
+    _book(restaurant, "noa", 2, NOON + timedelta(days = 1))
+    assert store.first_day(date.min) == day + timedelta(days = 1)
+    assert store.first_day(day + timedelta(days = 2)) == day + timedelta(days = 3)
+    assert store.first_day(day + timedelta(days = 4)) is None
+
+def test_reopen_keeps_reservations(tmp_path):
+    path = str(tmp_path / "restaurants.db")
+    engine = SqliteStorage(path)
+    restaurant = _restaurant(engine)
+    done = _book(restaurant, "dana", 2, NOON)
+    restaurant.reservations.order_dish(done.id, "soup", "first_course")
+    restaurant.reservations.add_comment(done.id, "window")
+    upcoming = _book(restaurant, "noa", 4, NOON + 2 * HOUR)
+    restaurant.reservations.archive_finished(NOON + HOUR)
+    engine.close()
+
+    engine = SqliteStorage(path)
+    try:
+        reservations = rest.Restaurants(engine).get_restaurant_by_name("luigi").reservations
+        assert [r.id for r in reservations.get_all_reservations()] == [upcoming.id]
+        archived = reservations.get_reservation_by_id(done.id)
+        assert (archived.name, archived.subtotal, list(archived.comments)) == ("dana", 10, ["window"])
+        later = reservations.new_reservation(ReservationDetails("gil", 2, NOON + 5 * HOUR, HOUR))
+        assert later.id > upcoming.id
+    finally:
+        engine.close()
+
+if __name__ == "__main__":
+    pass
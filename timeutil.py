@@ -0,0 +1,14 @@
+"""
+reservation times as whole epoch minutes, the form the journal, the
+snapshots, the archive and the sqlite engine keep them in
+"""
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+MINUTE = timedelta(minutes = 1)
+
+def to_minutes(moment:datetime) -> int:
+    return (moment - EPOCH) // MINUTE
+
+def from_minutes(minutes:int) -> datetime:
+    return EPOCH + minutes * MINUTE
@@ -0,0 +1,13 @@
+from typing import TypeVar
+
+T = TypeVar("T")
+
+def trusted(cls:type[T], **values) -> T:
+    """
+    builds a pydantic dataclass without running its validation,
+    only for values the app built itself from already valid objects.
+    anything typed in by a user goes through the normal constructor
+    """
+    instance = object.__new__(cls)
+    instance.__dict__ = values
+    return instance